@@ -1,15 +1,17 @@
 import streamlit as st
 from tools.feed_parser import DefaultFeedParserStrategy
-from tools.summary_creator import TranscriptSummarizer
-from tools.podcast_chatbot import ChatBotInterface
+from tools.summary_creator import TranscriptSummarizer, SUMMARY_PROMPT_PATH
+from tools.podcast_chatbot import ChatBotInterface, transcript_hash, create_embeddings
+from tools.answer_cache import SemanticAnswerCache
+from tools.catalog_index import CatalogIndex, CatalogChatBot
 from tools.supabase_client import SupabaseClient
+from tools.feed_cache import FeedCache
+from tools.single_flight import SingleFlight
 import readtime
 import feedparser
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from typing import Dict, Optional
-import tempfile
-import os
 
 @dataclass
 class Episode:
@@ -23,46 +25,55 @@ class Episode:
 supabase = SupabaseClient()
 FEED_URL = st.secrets["podcast"]["feed_url"]
 
-@st.cache_data
-def get_episodes():
-    try:
-        feed_content = feedparser.parse(FEED_URL)
-        enriched_episodes = []
+def parse_episodes(feed_bytes):
+    feed_content = feedparser.parse(feed_bytes)
+    enriched_episodes = []
+    
+    for entry in feed_content.entries[:106]:
+        # Extract basic info
+        title = entry.get('title', '').strip()
+        published = entry.get('published', '')
+        duration = entry.get('itunes_duration', '')
         
-        for entry in feed_content.entries[:106]:
-            # Extract basic info
-            title = entry.get('title', '').strip()
-            published = entry.get('published', '')
-            duration = entry.get('itunes_duration', '')
-            
-            # Get the raw HTML content
-            html_content = entry.content[0].value if 'content' in entry and entry.content else entry.get('summary', '')
-            
-            # Format duration
-            try:
-                duration_secs = int(duration)
-                minutes = duration_secs // 60
-                duration_formatted = f"{minutes} minutes"
-            except:
-                duration_formatted = duration
-            
-            # Create serializable Episode object
-            episode = Episode(
-                title=title,
-                publication_date=published,
-                duration=duration_formatted,
-                html_content=html_content,
-                mp3_url=entry.links[0].href if entry.links else None
-            )
-            
-            enriched_episodes.append(episode)
+        # Get the raw HTML content
+        html_content = entry.content[0].value if 'content' in entry and entry.content else entry.get('summary', '')
         
-        # Sort by date (newest first)
-        enriched_episodes.sort(
-            key=lambda x: datetime.strptime(x.publication_date, '%a, %d %b %Y %H:%M:%S %z'), 
-            reverse=True
+        # Format duration
+        try:
+            duration_secs = int(duration)
+            minutes = duration_secs // 60
+            duration_formatted = f"{minutes} minutes"
+        except:
+            duration_formatted = duration
+        
+        # Create serializable Episode object
+        episode = Episode(
+            title=title,
+            publication_date=published,
+            duration=duration_formatted,
+            html_content=html_content,
+            mp3_url=entry.links[0].href if entry.links else None
         )
         
+        enriched_episodes.append(episode)
+    
+    # Sort by date (newest first)
+    enriched_episodes.sort(
+        key=lambda x: datetime.strptime(x.publication_date, '%a, %d %b %Y %H:%M:%S %z'), 
+        reverse=True
+    )
+    # Stored as plain dicts in the on-disk feed cache
+    return [asdict(episode) for episode in enriched_episodes]
+
+@st.cache_resource
+def get_feed_cache():
+    # One cache per process; it refreshes itself in the background with conditional requests
+    return FeedCache(FEED_URL, parse_episodes)
+
+@st.cache_data(ttl=60)
+def get_episodes():
+    try:
+        enriched_episodes = [Episode(**episode) for episode in get_feed_cache().get_episodes()]
         st.write(f"Found {len(enriched_episodes)} episodes")
         return enriched_episodes
     
@@ -70,84 +81,156 @@ def get_episodes():
         st.error(f"Error fetching episodes: {str(e)}")
         return []
 
+@st.cache_resource
+def get_summary_flights():
+    # Shared by all sessions, so concurrent requests for the same summary share one generation
+    return SingleFlight(checkpoint_dir='./cache/summary_checkpoints')
+
 def get_or_create_summary(episode_title: str, transcript_text: str):
     try:
-        # Check if summary exists in Supabase
-        existing_summary = supabase.get_summary(episode_title)
+        summarizer = TranscriptSummarizer(system_file_path=SUMMARY_PROMPT_PATH)
+
+        # Check if a summary for the current model and prompt exists in Supabase
+        # (normally precomputed by tools/precompute_summaries.py)
+        existing_summary = supabase.get_summary(episode_title, version=summarizer.version)
         if existing_summary:
             st.markdown("### Summary")
             st.markdown(existing_summary)
             st.write(f'Estimated reading time: {str(readtime.of_text(existing_summary).text)}')
             return existing_summary
         
-        # Create new summary
-        summarizer = TranscriptSummarizer(system_file_path='./tools/prompts/extrac_widom_refined_claude.md')
-        
-        # Stream the summary to the screen first
+        # Create new summary, or follow the generation another session already started.
+        # It runs in the background and is stored once when complete, even if this session goes away.
+        metadata = {'episode_title': episode_title, 'summary_version': summarizer.version}
+
+        def store_summary(summary):
+            supabase.upload_summary(transcript_id=None, summary_text=summary, metadata=metadata)
+
+        summary_stream = get_summary_flights().stream(
+            f"{summarizer.version}:{episode_title}",
+            lambda partial: summarizer.summarize_transcript(transcript_text, resume_from=partial),
+            on_complete=store_summary
+        )
         st.markdown("### Summary")
-        summary = st.write_stream(summarizer.summarize_transcript(transcript_text))
+        summary = st.write_stream(summary_stream)
         st.write(f'Estimated reading time: {str(readtime.of_text(summary).text)}')
         
-        # Store in Supabase after streaming is complete
-        metadata = {'episode_title': episode_title}
-        supabase.upload_summary(transcript_id=None, summary_text=summary, metadata=metadata)
-        
         return summary
     except Exception as e:
         st.error(f"Error in summary creation: {str(e)}")
         return None
     
+@st.cache_resource
+def get_answer_cache():
+    # Shared by all sessions, so popular questions about an episode are answered once
+    return SemanticAnswerCache(create_embeddings())
+
+@st.cache_resource(max_entries=32)
+def get_chatbot(content_hash: str, _transcript_text: str):
+    # Keyed by the transcript's content hash only, so fragment reruns and other sessions
+    # reuse the same chatbot and its persisted per-episode vector collection
+    return ChatBotInterface(transcript_text=_transcript_text, answer_cache=get_answer_cache())
+
 @st.fragment
 def chat_with_podcast(transcript_text: str, episode_title: str):
-    # Create a temporary file for the transcript
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as tmp:
-        # Write the transcript text to the temporary file
-        tmp.write(transcript_text)
-        tmp_path = tmp.name
-        
-        try:
-            with st.spinner('Loading the chatbot...'):
-                # Load the chatbot interface with the temporary file path
-                chatbot = ChatBotInterface(
-                    transcript_path=tmp_path
-                )
-                chatbot.chat(episode_title)
-        finally:
-            # Clean up the temporary file
-            os.unlink(tmp_path)
+    with st.spinner('Loading the chatbot...'):
+        chatbot = get_chatbot(transcript_hash(transcript_text), transcript_text)
+    chatbot.chat(episode_title)
+
+@st.cache_resource(ttl=3600)
+def get_catalog_chatbot():
+    # Incremental: only transcripts added since the last sync get embedded
+    catalog = CatalogIndex()
+    added = catalog.sync(supabase)
+    if added:
+        st.toast(f"Indexed {added} new transcripts")
+    return CatalogChatBot(catalog, answer_cache=get_answer_cache())
+
+@st.fragment
+def chat_with_catalog():
+    with st.spinner('Loading the catalog...'):
+        chatbot = get_catalog_chatbot()
+    chatbot.chat('all episodes', label="Ask across all episodes:")
+
+PAGE_SIZE_OPTIONS = [10, 20, 50]
+
+def episode_date(episode):
+    return datetime.strptime(episode.publication_date, '%a, %d %b %Y %H:%M:%S %z').date()
+
+def filter_episodes(episodes, query, date_range):
+    query = query.strip().lower()
+    filtered = [episode for episode in episodes if query in episode.title.lower()] if query else episodes
+    # date_input returns a single date while the user is still picking the range
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        start, end = date_range
+        filtered = [episode for episode in filtered if start <= episode_date(episode) <= end]
+    return filtered
+
+def display_episode(episode, availability=None):
+    status = (availability or {}).get(episode.title, {})
+    badges = ''.join([' :green[transcript]' if status.get('transcript') else '',
+                      ' :blue[summary]' if status.get('summary') else ''])
+    try:
+        with st.expander(f":orange[**{episode.title}**]{badges}"):
+            # Display metadata
+            st.markdown(f"**Published on:** {episode.publication_date}")
+            st.markdown(f"**Duration:** {episode.duration}")
+            
+            # Show notes are only sent to the browser when asked for
+            if st.toggle("Show notes", key=f"notes_{episode.title}"):
+                st.html(episode.html_content)
+            
+            if st.button("Summarize & Chat", key=f"summarize_{episode.title}"):
+                transcript = supabase.get_transcript(episode.title)
+                
+                if transcript:
+                    with st.spinner('Generating summary...'):
+                        summary = get_or_create_summary(episode.title, transcript)
+                        # if summary:
+                        #     st.markdown("### Summary")
+                        #     st.markdown(summary)
+                        #     st.write(f'Estimated reading time: {str(readtime.of_text(summary).text)}')
+                    
+                    # Enable chat
+                    chat_with_podcast(transcript, episode.title)
+                else:
+                    st.error(f"Transcript not found for episode: {episode.title}")
+    except Exception as e:
+        st.error(f"Error processing episode {episode.title}: {str(e)}")
 
 def display_episodes(episodes):
     if not episodes:
         st.warning("No episodes found")
         return
 
-    for idx, episode in enumerate(episodes):
-        try:
-            with st.expander(f":orange[**{episode.title}**]"):
-                # Display metadata
-                st.markdown(f"**Published on:** {episode.publication_date}")
-                st.markdown(f"**Duration:** {episode.duration}")
-                
-                # Display HTML content directly
-                st.html(episode.html_content)
-                
-                if st.button("Summarize & Chat", key=f"summarize_{episode.title}"):
-                    transcript = supabase.get_transcript(episode.title)
-                    
-                    if transcript:
-                        with st.spinner('Generating summary...'):
-                            summary = get_or_create_summary(episode.title, transcript)
-                            # if summary:
-                            #     st.markdown("### Summary")
-                            #     st.markdown(summary)
-                            #     st.write(f'Estimated reading time: {str(readtime.of_text(summary).text)}')
-                        
-                        # Enable chat
-                        chat_with_podcast(transcript, episode.title)
-                    else:
-                        st.error(f"Transcript not found for episode: {episode.title}")
-        except Exception as e:
-            st.error(f"Error processing episode {episode.title}: {str(e)}")
+    # Search and filter
+    search_col, date_col = st.columns([2, 1])
+    query = search_col.text_input("Search episodes by title")
+    dates = [episode_date(episode) for episode in episodes]
+    date_range = date_col.date_input("Published between", value=(min(dates), max(dates)),
+                                     min_value=min(dates), max_value=max(dates))
+    filtered = filter_episodes(episodes, query, date_range)
+    if not filtered:
+        st.info("No episodes match the filters")
+        return
+
+    # Only the current page is rendered
+    size_col, page_col = st.columns([1, 1])
+    page_size = size_col.selectbox("Episodes per page", PAGE_SIZE_OPTIONS)
+    page_count = (len(filtered) - 1) // page_size + 1
+    page = page_col.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+    start = (page - 1) * page_size
+    st.caption(f"Showing {start + 1}-{min(start + page_size, len(filtered))} of {len(filtered)} episodes")
+
+    # One bulk lookup for the whole page instead of per-episode queries
+    try:
+        availability = supabase.get_availability()
+    except Exception as e:
+        st.warning(f"Could not check transcript availability: {str(e)}")
+        availability = {}
+
+    for episode in filtered[start:start + page_size]:
+        display_episode(episode, availability)
 
 def main():
     st.title("Future Weekly Podcast Episode Summaries")
@@ -155,6 +238,9 @@ def main():
     # Load podcast feed
     st.write("Loading podcast feed...")  # Debug info
     episodes = get_episodes()
+
+    if st.toggle("Ask across all episodes"):
+        chat_with_catalog()
     
     # Display episodes
     display_episodes(episodes)
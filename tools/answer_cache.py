@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def _normalize(question):
+    return ' '.join(question.lower().split()).rstrip('?!. ')
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticAnswerCache:
+    """
+    An in-process cache of chat answers, scoped per episode and matched by question similarity.
+
+    A question is answered from the cache when it matches a cached question of the same episode
+    exactly (after normalisation) or when their embeddings are at least ``threshold`` cosine
+    similar. Each scope remembers the transcript content hash its answers were generated from;
+    a lookup with a different hash drops the scope's answers. Entries expire after ``ttl_s``
+    and each scope keeps at most ``max_entries`` answers (least recently used go first).
+    """
+
+    def __init__(self, embeddings, threshold=0.95, ttl_s=24 * 3600, max_entries=256, max_scopes=512):
+        """
+        Initializes the cache.
+
+        :param embeddings: Embeddings
+            The embeddings model used to compare questions.
+        :param threshold: float, optional
+            Minimum cosine similarity for a semantic hit.
+        :param ttl_s: float, optional
+            Lifetime of a cached answer in seconds.
+        :param max_entries: int, optional
+            Maximum number of answers per scope.
+        :param max_scopes: int, optional
+            Maximum number of scopes (episodes) kept.
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self.scopes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _scope(self, scope, content_hash):
+        entry = self.scopes.get(scope)
+        if entry is None or entry['content_hash'] != content_hash:
+            entry = {'content_hash': content_hash, 'answers': OrderedDict()}
+            self.scopes[scope] = entry
+        self.scopes.move_to_end(scope)
+        while len(self.scopes) > self.max_scopes:
+            self.scopes.popitem(last=False)
+        return entry['answers']
+
+    def _expire(self, answers):
+        now = time.time()
+        for key in [key for key, answer in answers.items() if now - answer['created'] > self.ttl_s]:
+            del answers[key]
+
+    def lookup(self, scope, content_hash, question, semantic=True):
+        """
+        Finds a cached answer for a question.
+
+        :param scope: str
+            The episode the question is about.
+        :param content_hash: str
+            Content hash of the episode's transcript.
+        :param question: str
+            The user question.
+        :param semantic: bool, optional
+            Also match similar questions by embedding. Pass False when the question would not be
+            embedded otherwise (lexical-only retrieval), so a miss costs no embedding call.
+        :return: tuple
+            ``(answer, embedding)``; the answer is None on a miss, and the question embedding
+            (None if it was not needed) can be passed on to :meth:`store`.
+        """
+        key = _normalize(question)
+        with self.lock:
+            answers = self._scope(scope, content_hash)
+            self._expire(answers)
+            if key in answers:
+                answers.move_to_end(key)
+                return answers[key]['answer'], answers[key]['embedding']
+            candidates = [(key, answer) for key, answer in answers.items() if answer['embedding'] is not None]
+            if not semantic or not candidates:
+                return None, None
+
+        embedding = self.embeddings.embed_query(question)
+        best_key, best_score = None, 0.0
+        for candidate_key, candidate in candidates:
+            score = _cosine(embedding, candidate['embedding'])
+            if score > best_score:
+                best_key, best_score = candidate_key, score
+        if best_key is None or best_score < self.threshold:
+            return None, embedding
+        with self.lock:
+            # The scope may have been refreshed for a new transcript or invalidated while the
+            # question was embedded; its old answers must not be served
+            entry = self.scopes.get(scope)
+            if entry is None or entry['content_hash'] != content_hash or entry['answers'] is not answers:
+                return None, embedding
+            answer = answers.get(best_key)
+            if answer is None:
+                return None, embedding
+            answers.move_to_end(best_key)
+            return answer['answer'], embedding
+
+    def store(self, scope, content_hash, question, answer, embedding=None, semantic=True):
+        """
+        Caches the answer to a question.
+
+        :param scope: str
+            The episode the question is about.
+        :param content_hash: str
+            Content hash of the episode's transcript.
+        :param question: str
+            The user question.
+        :param answer: str
+            The generated answer.
+        :param embedding: list, optional
+            The question embedding, if :meth:`lookup` already computed it.
+        :param semantic: bool, optional
+            Embed the question if no embedding is given; with False, the answer is only found
+            again by an exact (normalised) match.
+        """
+        if embedding is None and semantic:
+            embedding = self.embeddings.embed_query(question)
+        with self.lock:
+            answers = self._scope(scope, content_hash)
+            answers[_normalize(question)] = {'answer': answer, 'embedding': embedding, 'created': time.time()}
+            while len(answers) > self.max_entries:
+                answers.popitem(last=False)
+
+    def invalidate(self, scope):
+        """
+        Drops every cached answer of a scope.
+
+        :param scope: str
+            The episode whose answers are dropped.
+        """
+        with self.lock:
+            self.scopes.pop(scope, None)
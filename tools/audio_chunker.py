@@ -0,0 +1,113 @@
+import subprocess
+from dataclasses import dataclass
+from pydub.utils import mediainfo_json, get_encoder_name
+
+
+@dataclass
+class AudioChunk:
+    index: int
+    start_s: float
+    duration_s: float
+    data: bytes
+    format: str
+
+    @property
+    def filename(self) -> str:
+        return f"chunk_{self.index}.{self.format}"
+
+
+class AudioChunker:
+    """
+    Splits an audio file into in-memory chunks without decoding the whole file.
+
+    Each chunk is cut by ffmpeg directly from the source file and returned through a pipe, so
+    neither the full PCM stream nor temporary chunk files are ever materialised. In ``copy`` mode
+    the compressed MP3 frames are copied as-is (no decode at all); in ``flac`` mode each chunk
+    is decoded once and downsampled to 16 kHz mono, which is what Whisper models consume anyway.
+    """
+
+    MODES = ('copy', 'flac')
+
+    def __init__(self, chunk_length_s: float = 600, mode: str = 'copy'):
+        """
+        Initialize the AudioChunker.
+
+        :param chunk_length_s: Length of each chunk in seconds.
+        :type chunk_length_s: float
+        :param mode: ``copy`` to stream-copy the compressed frames, ``flac`` to decode to 16 kHz mono FLAC.
+        :type mode: str
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown chunking mode: {mode}. Expected one of {self.MODES}")
+        self.chunk_length_s = chunk_length_s
+        self.mode = mode
+        self.ffmpeg = get_encoder_name()
+
+    def plan(self, audio_file: str) -> tuple:
+        """
+        Compute the (start, duration) windows for an audio file and the mode used to cut them.
+
+        Stream copy only works for MP3 sources, so other codecs fall back to ``flac``. The codec is
+        read from the first audio stream, since podcast MP3s often embed cover art as a video stream.
+
+        :param audio_file: Path to the audio file.
+        :type audio_file: str
+        :return: The chunking mode and a list of ``(start_s, duration_s)`` tuples.
+        :rtype: tuple
+        """
+        info = mediainfo_json(audio_file)
+        audio = next((stream for stream in info.get('streams', []) if stream.get('codec_type') == 'audio'), {})
+        total = float(info.get('format', {}).get('duration') or audio['duration'])
+        mode = self.mode if audio.get('codec_name') == 'mp3' else 'flac'
+        windows = []
+        start = 0.0
+        while start < total:
+            windows.append((start, min(self.chunk_length_s, total - start)))
+            start += self.chunk_length_s
+        return mode, windows
+
+    def extract(self, audio_file: str, index: int, start_s: float, duration_s: float, mode: str = None) -> AudioChunk:
+        """
+        Cut a single chunk out of the audio file into memory.
+
+        :param audio_file: Path to the audio file.
+        :type audio_file: str
+        :param index: The index of the chunk.
+        :type index: int
+        :param start_s: Offset of the chunk in seconds.
+        :type start_s: float
+        :param duration_s: Length of the chunk in seconds.
+        :type duration_s: float
+        :param mode: Overrides the chunker's mode for this chunk.
+        :type mode: str
+        :return: The extracted chunk.
+        :rtype: AudioChunk
+        :raises RuntimeError: If ffmpeg fails.
+        """
+        command = [self.ffmpeg, '-nostdin', '-loglevel', 'error',
+                   '-ss', f"{start_s:.3f}", '-t', f"{duration_s:.3f}", '-i', audio_file, '-vn']
+        if (mode or self.mode) == 'copy':
+            command += ['-c:a', 'copy', '-f', 'mp3']
+            fmt = 'mp3'
+        else:
+            command += ['-ac', '1', '-ar', '16000', '-c:a', 'flac', '-f', 'flac']
+            fmt = 'flac'
+        command.append('pipe:1')
+
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed on chunk {index}: {result.stderr.decode(errors='ignore').strip()}")
+        return AudioChunk(index=index, start_s=start_s, duration_s=duration_s, data=result.stdout, format=fmt)
+
+    def iter_chunks(self, audio_file: str):
+        """
+        Lazily yield the chunks of an audio file, one at a time.
+
+        :param audio_file: Path to the audio file.
+        :type audio_file: str
+        :return: Generator of AudioChunk instances.
+        :rtype: Generator
+        """
+        mode, windows = self.plan(audio_file)
+        for index, (start_s, duration_s) in enumerate(windows):
+            yield self.extract(audio_file, index, start_s, duration_s, mode)
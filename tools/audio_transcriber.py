@@ -3,8 +3,11 @@ import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 from transformers.utils import is_flash_attn_2_available
 import os
+import shutil
 import time
-from pydub import AudioSegment
+from contextlib import contextmanager
+from pydub.utils import mediainfo
+from audio_chunker import AudioChunker
 from lightning_sdk import Studio
 
 def calculate_ratio(audio_lengths_minutes, processing_times_seconds):
@@ -55,69 +58,192 @@ def estimate_processing_time(audio_length_hours, audio_length_minutes, audio_len
 class EpisodeTranscriber:
     """Transcribes podcast episodes from MP3 files."""
 
-    def __init__(self, parent_folder="./transcripts", model_id="distil-whisper/distil-large-v3"):
+    def __init__(self, parent_folder="./transcripts", model_id="distil-whisper/distil-large-v3", device="auto",
+                 cpu_threads=None, quantize=True, cpu_batch_size=4, cpu_chunk_length_s=30,
+                 model_cache_dir="./model_cache"):
         """
         Initialize the transcriber with the appropriate model and device settings.
 
         :param parent_folder: The directory where the transcriptions will be saved.
         :param model_id: The model ID for the transcription model.
+        :param device: "auto" to use the GPU when available, or "cpu" to force CPU execution.
+        :param cpu_threads: Number of intra-op threads used on CPU; defaults to all physical cores.
+        :param quantize: Whether to apply dynamic int8 quantization to the linear layers on CPU.
+        :param cpu_batch_size: Pipeline batch size on CPU.
+        :param cpu_chunk_length_s: Pipeline chunk length in seconds on CPU.
+        :param model_cache_dir: Directory for the warm model cache; None disables it.
         """
         self.parent_folder = parent_folder
+        self.model_id = model_id
+        self.cpu_threads = cpu_threads
+        self.quantize = quantize
+        self.cpu_batch_size = cpu_batch_size
+        self.cpu_chunk_length_s = cpu_chunk_length_s
+        self.model_cache_dir = model_cache_dir
+        self.last_rtf = None
+        self.startup_timings = {}
         os.makedirs(self.parent_folder, exist_ok=True)
-        self.setup_device_and_model(model_id)
+        self.setup_device_and_model(model_id, device)
 
-    def setup_device_and_model(self, model_id):
+    def setup_device_and_model(self, model_id, device="auto"):
         """
         Sets up device and model based on availability of GPU and Flash Attention 2.
 
+        On GPU the model runs in float16 with Flash Attention 2. On CPU it runs in float32 with
+        PyTorch SDPA attention, optionally with its linear layers dynamically quantized to int8,
+        and with batch and chunk sizes suited to CPU execution.
+
+        The first load saves the weights, already converted to the target dtype, as safetensors
+        in the warm model cache; later loads memory-map that copy instead of fetching and
+        converting the hub checkpoint again. The time spent in each phase is printed and kept
+        in ``self.startup_timings``.
+
         :param model_id: The model ID for the transcription model.
+        :param device: "auto" to use the GPU when available, or "cpu" to force CPU execution.
         """
-        if is_flash_attn_2_available() and torch.cuda.is_available():
+        if device == "auto" and is_flash_attn_2_available() and torch.cuda.is_available():
             print("Using Flash Attention 2 and GPU")
             device = "cuda:0"
             torch_dtype = torch.float16
+            attn_implementation = "flash_attention_2"
+            batch_size, chunk_length_s = 16, 25
         else:
             print("Using CPU execution")
             torch_dtype = torch.float32
             device = "cpu"
+            attn_implementation = "sdpa"
+            batch_size, chunk_length_s = self.cpu_batch_size, self.cpu_chunk_length_s
+            if self.cpu_threads:
+                torch.set_num_threads(self.cpu_threads)
+            print(f"Using {torch.get_num_threads()} intra-op threads")
 
         self.device = device
         self.torch_dtype = torch_dtype
 
-        self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id, torch_dtype=self.torch_dtype, low_cpu_mem_usage=True, use_safetensors=True,
-            attn_implementation="flash_attention_2"
-        ).to(self.device)
-
-        self.processor = AutoProcessor.from_pretrained(model_id)
-
-        self.pipe = pipeline(
-            "automatic-speech-recognition",
-            model=self.model,
-            tokenizer=self.processor.tokenizer,
-            feature_extractor=self.processor.feature_extractor,
-            max_new_tokens=128,
-            chunk_length_s=25,
-            batch_size=16,
-            torch_dtype=self.torch_dtype,
-            device=self.device,
-        )
+        cache_path = self._warm_cache_path(model_id, device, torch_dtype)
+        warm = cache_path is not None and os.path.isdir(cache_path)
+        source = cache_path if warm else model_id
+
+        with self._timed("load_weights"):
+            self.model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                source, torch_dtype=self.torch_dtype, low_cpu_mem_usage=True, use_safetensors=True,
+                attn_implementation=attn_implementation
+            )
+        with self._timed("to_device"):
+            self.model = self.model.to(self.device)
+        with self._timed("load_processor"):
+            self.processor = AutoProcessor.from_pretrained(source)
+
+        if cache_path is not None and not warm:
+            with self._timed("save_warm_cache"):
+                self._save_warm_cache(cache_path)
+
+        if self.device == "cpu" and self.quantize:
+            print("Applying dynamic int8 quantization to linear layers")
+            with self._timed("quantize"):
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        with self._timed("build_pipeline"):
+            self.pipe = pipeline(
+                "automatic-speech-recognition",
+                model=self.model,
+                tokenizer=self.processor.tokenizer,
+                feature_extractor=self.processor.feature_extractor,
+                max_new_tokens=128,
+                chunk_length_s=chunk_length_s,
+                batch_size=batch_size,
+                torch_dtype=self.torch_dtype,
+                device=self.device,
+            )
+        print(f"Model ready ({'warm cache' if warm else model_id}): "
+              + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.startup_timings.items()))
+
+    def _save_warm_cache(self, cache_path):
+        """
+        Saves the converted model and processor, moving them into place only once complete.
+
+        The files are written to a temporary sibling directory that is renamed to ``cache_path``,
+        so an interrupted save never leaves a partial cache that later startups would try to load.
+
+        :param cache_path: The warm cache directory.
+        """
+        tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+        try:
+            self.model.save_pretrained(tmp_path, safe_serialization=True)
+            self.processor.save_pretrained(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # e.g. another process finished the same cache first
+            print(f"Could not save the warm cache: {e}")
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _warm_cache_path(self, model_id, device, torch_dtype):
+        """
+        Returns the warm cache directory for a model converted to the given device and dtype.
+
+        :param model_id: The model ID for the transcription model.
+        :param device: The target device.
+        :param torch_dtype: The target dtype.
+        :returns: The cache directory, or None when the warm cache is disabled.
+        """
+        if not self.model_cache_dir:
+            return None
+        device_type = device.split(":")[0]
+        dtype_name = str(torch_dtype).replace("torch.", "")
+        return os.path.join(self.model_cache_dir, f"{model_id.replace('/', '--')}-{device_type}-{dtype_name}")
+
+    @contextmanager
+    def _timed(self, phase):
+        """
+        Records the wall-clock time of a startup phase in ``self.startup_timings``.
+
+        :param phase: Name of the phase.
+        """
+        start_time = time.time()
+        yield
+        self.startup_timings[phase] = time.time() - start_time
 
     def transcribe(self, mp3_file):
         """
         Transcribe the given MP3 file.
 
+        The achieved real-time factor (processing time / audio duration) is printed and kept in
+        ``self.last_rtf``.
+
         :param mp3_file: Path to the MP3 file to transcribe.
         :returns: Path to the transcription text file.
         """
-        audio = AudioSegment.from_mp3(mp3_file)
-        audio_length = len(audio) / 60000  # Convert milliseconds to minutes
+        audio_seconds = float(mediainfo(mp3_file)['duration'])
+        audio_length = audio_seconds / 60  # Convert seconds to minutes
         start_time = time.time()
-        outputs = self.pipe(mp3_file)
+        with torch.inference_mode():
+            outputs = self.pipe(mp3_file)
         transcription_time = time.time() - start_time
-        print(f"{audio_length} mins of audio transcribed in {transcription_time:.2f} seconds.")
+        self.last_rtf = transcription_time / audio_seconds
+        print(f"{audio_length:.2f} mins of audio transcribed in {transcription_time:.2f} seconds "
+              f"on {self.device} (real-time factor {self.last_rtf:.3f}).")
         return self.save(outputs, mp3_file)
 
+    def transcribe_stream(self, mp3_file, segment_length_s=300):
+        """
+        Transcribe the given MP3 file segment by segment, yielding each segment as it finishes.
+
+        The audio is cut into ``segment_length_s`` windows (decoded to 16 kHz mono in memory),
+        and each window is run through the pipeline on its own, so the first part of a long
+        episode is available long before the whole episode is done.
+
+        :param mp3_file: Path to the MP3 file to transcribe.
+        :param segment_length_s: Length of each streamed segment in seconds.
+        :returns: Generator of dicts with ``index``, ``start_s``, ``end_s`` and ``text``.
+        """
+        chunker = AudioChunker(chunk_length_s=segment_length_s, mode='flac')
+        for chunk in chunker.iter_chunks(mp3_file):
+            with torch.inference_mode():
+                outputs = self.pipe(chunk.data)
+            yield {'index': chunk.index, 'start_s': chunk.start_s, 'end_s': chunk.start_s + chunk.duration_s,
+                   'text': outputs['text'].strip()}
+
     def save(self, outputs, mp3_file):
         """
         Save transcription to a text file.
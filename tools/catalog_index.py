@@ -0,0 +1,270 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from tools.podcast_chatbot import ChatBotInterface, CHUNK_SIZE, CHUNK_OVERLAP, create_embeddings, get_chroma_client
+from tools.hybrid_retriever import BM25Index, HybridRetriever
+
+
+def _date_timestamp(date):
+    """
+    Parses an episode date (RFC 2822 as in the feed, or ISO 8601) into a Unix timestamp.
+
+    :param date: str
+        The date string from the transcript metadata.
+    :return: int or None
+        The timestamp, or None if the date cannot be parsed.
+    """
+    if not date:
+        return None
+    for parse in (parsedate_to_datetime, datetime.fromisoformat):
+        try:
+            return int(parse(date).timestamp())
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class CatalogIndex:
+    """
+    A single vector index over the transcripts of every episode in the catalog.
+
+    Chunks carry the episode title and date as metadata, so queries can be restricted to an
+    episode or a date range. The index is kept in sync incrementally: a manifest records which
+    transcript rows are indexed, and ``sync`` only fetches, embeds and inserts the new ones.
+    """
+
+    COLLECTION_NAME = 'catalog'
+
+    def __init__(self, persist_directory='./chroma/'):
+        """
+        Opens (or creates) the catalog collection and its manifest.
+
+        :param persist_directory: str, optional
+            Directory of the persistent Chroma store.
+        """
+        self.persist_directory = persist_directory
+        self.vectordb = self._open_collection()
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        self.manifest_path = os.path.join(persist_directory, 'catalog_manifest.json')
+        self.manifest = self._load_manifest()
+        self.lock = threading.Lock()
+
+        # The manifest is only trusted if the collection holds exactly the chunks it lists
+        expected = sum(entry['chunks'] for entry in self.manifest.values())
+        if self.vectordb._collection.count() != expected:
+            logging.warning("Catalog collection does not match its manifest, rebuilding it")
+            self.vectordb.delete_collection()
+            self.vectordb = self._open_collection()
+            self.manifest = {}
+            self._save_manifest()
+
+    def _open_collection(self):
+        return Chroma(
+            client=get_chroma_client(self.persist_directory),
+            collection_name=self.COLLECTION_NAME,
+            embedding_function=create_embeddings(),
+            persist_directory=self.persist_directory
+        )
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+    def version(self):
+        """
+        Identifies the current content of the index.
+
+        :return: str
+            A string that changes whenever the set of indexed transcript rows changes.
+        """
+        digest = hashlib.sha256(','.join(sorted(self.manifest)).encode('utf-8')).hexdigest()
+        return f"catalog-{digest[:16]}"
+
+    def sync(self, supabase, batch_size=20):
+        """
+        Brings the index up to date with the transcripts stored in Supabase.
+
+        Only the latest row (highest id) of each episode is indexed. Rows missing from the manifest
+        are fetched and embedded; rows that were deleted or superseded upstream are removed.
+
+        :param supabase: SupabaseClient
+            The client used to list and fetch transcripts.
+        :param batch_size: int, optional
+            Number of transcripts fetched per request.
+        :return: int
+            The number of transcripts added.
+        """
+        with self.lock:
+            # One row per episode, so duplicate rows do not evict each other on every sync
+            latest = {}
+            for row in supabase.list_transcripts():
+                title = (row.get('metadata') or {}).get('episode_title') or f"id:{row['id']}"
+                if title not in latest or row['id'] > latest[title]['id']:
+                    latest[title] = row
+            current_ids = {str(row['id']) for row in latest.values()}
+            for transcript_id in set(self.manifest) - current_ids:
+                self._remove(transcript_id)
+
+            new_ids = [row['id'] for row in latest.values() if str(row['id']) not in self.manifest]
+            for start in range(0, len(new_ids), batch_size):
+                for row in supabase.get_transcripts_by_ids(new_ids[start:start + batch_size]):
+                    self._upsert(str(row['id']), row['content'], row.get('metadata') or {})
+                self._save_manifest()
+
+            self._save_manifest()
+            self.vectordb.persist()
+            return len(new_ids)
+
+    def upsert_transcript(self, transcript_id, content, metadata):
+        """
+        Adds a single transcript to the index, replacing any older transcript of the same episode.
+
+        :param transcript_id: str
+            The id of the transcript row.
+        :param content: str
+            The transcript text.
+        :param metadata: dict
+            The transcript metadata (episode_title, date, ...).
+        """
+        with self.lock:
+            self._upsert(str(transcript_id), content, metadata)
+            self._save_manifest()
+            self.vectordb.persist()
+
+    def _upsert(self, transcript_id, content, metadata):
+        episode_title = metadata.get('episode_title', '')
+        for other_id, entry in list(self.manifest.items()):
+            if other_id != transcript_id and entry['episode_title'] == episode_title:
+                self._remove(other_id)
+        if transcript_id in self.manifest:
+            self._remove(transcript_id)
+
+        chunk_metadata = {
+            'transcript_id': transcript_id,
+            'episode_title': episode_title,
+            'date': metadata.get('date') or '',
+        }
+        date_ts = _date_timestamp(metadata.get('date'))
+        if date_ts is not None:
+            chunk_metadata['date_ts'] = date_ts
+        documents = self.text_splitter.create_documents([content], metadatas=[chunk_metadata])
+        ids = [f"{transcript_id}-{i}" for i in range(len(documents))]
+        if documents:
+            self.vectordb.add_documents(documents, ids=ids)
+        self.manifest[transcript_id] = {'episode_title': episode_title, 'chunks': len(documents)}
+
+    def _remove(self, transcript_id):
+        entry = self.manifest.pop(transcript_id, None)
+        if entry and entry['chunks']:
+            self.vectordb._collection.delete(ids=[f"{transcript_id}-{i}" for i in range(entry['chunks'])])
+
+    def documents(self, episode_title=None, date_from=None, date_to=None):
+        """
+        Returns the indexed chunks, optionally filtered by episode or date.
+
+        :param episode_title: str, optional
+            Only return chunks of this episode.
+        :param date_from: datetime, optional
+            Only return chunks of episodes published on or after this date.
+        :param date_to: datetime, optional
+            Only return chunks of episodes published on or before this date.
+        :return: list
+            The chunks as Documents.
+        """
+        stored = self.vectordb._collection.get(include=['documents', 'metadatas'])
+        documents = []
+        for text, metadata in zip(stored['documents'], stored['metadatas']):
+            date_ts = metadata.get('date_ts')
+            if episode_title and metadata.get('episode_title') != episode_title:
+                continue
+            if date_from and (date_ts is None or date_ts < date_from.timestamp()):
+                continue
+            if date_to and (date_ts is None or date_ts > date_to.timestamp()):
+                continue
+            documents.append(Document(page_content=text, metadata=metadata))
+        return documents
+
+    def as_retriever(self, episode_title=None, date_from=None, date_to=None, k=4):
+        """
+        Creates a retriever over the whole catalog, optionally filtered by episode or date.
+
+        :param episode_title: str, optional
+            Restrict results to this episode.
+        :param date_from: datetime, optional
+            Restrict results to episodes published on or after this date.
+        :param date_to: datetime, optional
+            Restrict results to episodes published on or before this date.
+        :param k: int, optional
+            Number of chunks to retrieve.
+        :return: VectorStoreRetriever
+            The retriever.
+        """
+        conditions = []
+        if episode_title:
+            conditions.append({'episode_title': episode_title})
+        if date_from:
+            conditions.append({'date_ts': {'$gte': int(date_from.timestamp())}})
+        if date_to:
+            conditions.append({'date_ts': {'$lte': int(date_to.timestamp())}})
+        search_kwargs = {'k': k}
+        if len(conditions) == 1:
+            search_kwargs['filter'] = conditions[0]
+        elif conditions:
+            search_kwargs['filter'] = {'$and': conditions}
+        return self.vectordb.as_retriever(search_kwargs=search_kwargs)
+
+
+class CatalogChatBot(ChatBotInterface):
+    """A chat bot that answers questions across every episode in the catalog."""
+
+    def __init__(self, catalog, model='gpt-4o', episode_title=None, date_from=None, date_to=None, answer_cache=None):
+        """
+        Initializes the catalog chat bot.
+
+        :param catalog: CatalogIndex
+            The synced catalog index.
+        :param model: str, optional
+            The model identifier for the OpenAI API.
+        :param episode_title: str, optional
+            Restrict answers to this episode.
+        :param date_from: datetime, optional
+            Restrict answers to episodes published on or after this date.
+        :param date_to: datetime, optional
+            Restrict answers to episodes published on or before this date.
+        :param answer_cache: SemanticAnswerCache, optional
+            Shared cache of answers to similar questions; invalidated when the catalog changes.
+        """
+        self.catalog = catalog
+        self.filters = {'episode_title': episode_title, 'date_from': date_from, 'date_to': date_to}
+        super().__init__(model=model, answer_cache=answer_cache)
+        self.transcript_hash = catalog.version()
+
+    def setup_vector_db(self):
+        return self.catalog.vectordb
+
+    def load_and_split_transcript(self):
+        return self.catalog.documents(**self.filters)
+
+    def setup_retriever(self):
+        return HybridRetriever(
+            bm25=BM25Index(self.load_and_split_transcript()),
+            vector_retriever=self.catalog.as_retriever(k=8, **self.filters),
+            k=4,
+            mode=self.retrieval_mode
+        )
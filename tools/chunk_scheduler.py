@@ -0,0 +1,250 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from retry import CircuitOpenError
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+
+    Tokens refill continuously at ``capacity / period_s`` per second up to ``capacity``.
+    """
+
+    def __init__(self, capacity: float, period_s: float):
+        """
+        Initialize the TokenBucket.
+
+        :param capacity: Maximum number of tokens, i.e. the quota per period.
+        :type capacity: float
+        :param period_s: Length of the quota period in seconds.
+        :type period_s: float
+        """
+        self.capacity = capacity
+        self.rate = capacity / period_s
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1):
+        """
+        Block until ``amount`` tokens are available and take them.
+
+        :param amount: Number of tokens to take; capped at the bucket capacity.
+        :type amount: float
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def empty(self):
+        """Drop all tokens, e.g. after the upstream reported that the quota is exhausted."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0
+
+
+class _Job:
+    def __init__(self, fn, args, audio_seconds, future):
+        self.fn = fn
+        self.args = args
+        self.audio_seconds = audio_seconds
+        self.future = future
+        self.attempts = 0
+
+
+def _status_code(exc):
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status
+
+
+def _retry_after(exc):
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ChunkScheduler:
+    """
+    A process-wide scheduler for transcription chunk jobs.
+
+    Jobs from any number of episodes share one queue, a requests-per-minute bucket and an
+    audio-seconds-per-hour bucket. The number of jobs in flight adapts to the upstream:
+    it grows by one after each fast success, shrinks by one after a slow one and halves on
+    throttling (HTTP 429). Failed jobs are re-queued individually with exponential backoff, honouring
+    ``Retry-After`` when the upstream sends it.
+    """
+
+    def __init__(self, requests_per_minute: int = 20, audio_seconds_per_hour: int = 7200,
+                 max_concurrency: int = 10, min_concurrency: int = 1, target_latency_s: float = 30,
+                 max_attempts: int = 4, backoff_s: float = 2):
+        """
+        Initialize the ChunkScheduler.
+
+        :param requests_per_minute: The API's request quota per minute.
+        :type requests_per_minute: int
+        :param audio_seconds_per_hour: The API's audio-seconds quota per hour.
+        :type audio_seconds_per_hour: int
+        :param max_concurrency: Upper bound on jobs in flight.
+        :type max_concurrency: int
+        :param min_concurrency: Lower bound on jobs in flight.
+        :type min_concurrency: int
+        :param target_latency_s: Responses slower than this shrink the concurrency limit.
+        :type target_latency_s: float
+        :param max_attempts: Number of attempts per job before its future fails.
+        :type max_attempts: int
+        :param backoff_s: Base delay for the exponential retry backoff.
+        :type backoff_s: float
+        """
+        self.request_bucket = TokenBucket(requests_per_minute, 60)
+        self.audio_bucket = TokenBucket(audio_seconds_per_hour, 3600)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency_s = target_latency_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+
+        self.limit = max(min_concurrency, min(max_concurrency, 2))
+        self.active = 0
+        self.paused_until = 0.0
+        self.stats = {'submitted': 0, 'succeeded': 0, 'retried': 0, 'failed': 0, 'throttled': 0}
+        self.queue = queue.Queue()
+        self.condition = threading.Condition()
+        self.workers = [threading.Thread(target=self._worker, daemon=True, name=f'chunk-scheduler-{i}')
+                        for i in range(max_concurrency)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, fn, *args, audio_seconds: float = 0) -> Future:
+        """
+        Schedule a chunk job.
+
+        :param fn: The callable that performs the request.
+        :type fn: Callable
+        :param args: Positional arguments for ``fn``.
+        :param audio_seconds: The amount of audio the job sends, charged against the audio quota.
+        :type audio_seconds: float
+        :return: A future resolved with the result of ``fn``.
+        :rtype: Future
+        """
+        future = Future()
+        with self.condition:
+            self.stats['submitted'] += 1
+        self.queue.put(_Job(fn, args, audio_seconds, future))
+        return future
+
+    def _acquire_slot(self):
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.active >= self.limit:
+                    self.condition.wait()
+                else:
+                    self.active += 1
+                    return
+
+    def _release_slot(self, latency_s=None, throttled=False, retry_after=None):
+        with self.condition:
+            self.active -= 1
+            if throttled:
+                self.stats['throttled'] += 1
+                self.limit = max(self.min_concurrency, self.limit // 2)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif latency_s is not None:
+                if latency_s > self.target_latency_s:
+                    self.limit = max(self.min_concurrency, self.limit - 1)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+            self.condition.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            if not job.future.running() and not job.future.set_running_or_notify_cancel():
+                continue
+            self._acquire_slot()
+            self.request_bucket.acquire()
+            self.audio_bucket.acquire(job.audio_seconds)
+            job.attempts += 1
+            start = time.monotonic()
+            try:
+                result = job.fn(*job.args)
+            except CircuitOpenError as exc:
+                # Not an attempt: the request never left; wait for the breaker instead of failing
+                job.attempts -= 1
+                self._release_slot()
+                logging.warning(f"Chunk job deferred {exc.retry_in:.1f}s: {exc}")
+                timer = threading.Timer(exc.retry_in, self.queue.put, args=(job,))
+                timer.daemon = True
+                timer.start()
+            except Exception as exc:
+                throttled = _status_code(exc) == 429
+                retry_after = _retry_after(exc)
+                if throttled:
+                    self.request_bucket.empty()
+                self._release_slot(throttled=throttled, retry_after=retry_after)
+                self._retry_or_fail(job, exc, retry_after)
+            else:
+                self._release_slot(latency_s=time.monotonic() - start)
+                with self.condition:
+                    self.stats['succeeded'] += 1
+                job.future.set_result(result)
+
+    def _retry_or_fail(self, job, exc, retry_after=None):
+        status = _status_code(exc)
+        retryable = status is None or status == 429 or status >= 500
+        if not retryable or job.attempts >= self.max_attempts:
+            logging.error(f"Chunk job failed after {job.attempts} attempt(s): {exc}")
+            with self.condition:
+                self.stats['failed'] += 1
+            job.future.set_exception(exc)
+            return
+        delay = retry_after or self.backoff_s * 2 ** (job.attempts - 1)
+        logging.warning(f"Chunk job attempt {job.attempts} failed ({exc}); retrying in {delay:.1f}s")
+        with self.condition:
+            self.stats['retried'] += 1
+        # the job's future stays pending; only this job goes back on the queue
+        timer = threading.Timer(delay, self.queue.put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(**kwargs) -> ChunkScheduler:
+    """
+    Return the process-wide scheduler, creating it on first use.
+
+    :param kwargs: Arguments for :class:`ChunkScheduler`; only honoured on the first call.
+    :return: The shared scheduler.
+    :rtype: ChunkScheduler
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ChunkScheduler(**kwargs)
+        return _scheduler
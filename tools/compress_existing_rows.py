@@ -0,0 +1,52 @@
+import argparse
+from supabase_client import SupabaseClient, encode_content, is_encoded
+
+def compress_existing_rows(table: str, compression: str, batch_size: int = 50, dry_run: bool = False):
+    supabase = SupabaseClient(compression=compression)
+    converted = 0
+    bytes_before = 0
+    bytes_after = 0
+    start = 0
+
+    while True:
+        # Page through the table by id so rows updated along the way are not skipped or revisited
+        response = supabase.client.table(table)\
+            .select('id, content')\
+            .order('id')\
+            .range(start, start + batch_size - 1)\
+            .execute()
+        rows = response.data
+        if not rows:
+            break
+
+        for row in rows:
+            content = row['content']
+            if not content or is_encoded(content):
+                continue
+            encoded = encode_content(content, compression)
+            bytes_before += len(content.encode('utf-8'))
+            bytes_after += len(encoded)
+            converted += 1
+            if dry_run:
+                continue
+            try:
+                supabase.client.table(table).update({'content': encoded}).eq('id', row['id']).execute()
+            except Exception as e:
+                print(f"Failed to compress {table} row {row['id']}: {str(e)}")
+
+        start += batch_size
+
+    action = "Would compress" if dry_run else "Compressed"
+    saved = 100 * (1 - bytes_after / bytes_before) if bytes_before else 0
+    print(f"{action} {converted} {table} rows: {bytes_before} -> {bytes_after} bytes ({saved:.1f}% smaller)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert uncompressed transcript and summary rows to compressed storage.")
+    parser.add_argument('--compression', choices=['gzip', 'zstd'], default='gzip')
+    parser.add_argument('--tables', nargs='+', default=['transcripts', 'summaries'])
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--dry-run', action='store_true', help="Report the savings without updating any rows")
+    args = parser.parse_args()
+
+    for table in args.tables:
+        compress_existing_rows(table, args.compression, batch_size=args.batch_size, dry_run=args.dry_run)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from tools.retry import retry
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model with a persistent, size-bounded cache of chunk embeddings.
+
+    Vectors are stored in a local SQLite file keyed by (embedding model, SHA-256 of the chunk
+    text), so re-chunking a transcript only pays for chunks whose text actually changed.
+    Cache misses are grouped into large batches that are sent to the model concurrently, and
+    the least recently used entries are evicted once the cache holds more than ``max_entries``.
+    """
+
+    def __init__(self, embeddings, model_name, cache_path='./cache/embeddings.sqlite', max_entries=200_000,
+                 batch_size=512, max_workers=4):
+        """
+        Initializes the cache around an embeddings model.
+
+        :param embeddings: Embeddings
+            The underlying embeddings model.
+        :param model_name: str
+            Identifier of the embedding model, part of every cache key.
+        :param cache_path: str, optional
+            Path of the SQLite cache file.
+        :param max_entries: int, optional
+            Maximum number of cached vectors before LRU eviction.
+        :param batch_size: int, optional
+            Number of texts per embedding request.
+        :param max_workers: int, optional
+            Number of embedding requests sent concurrently.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings '
+                '(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)'
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)')
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.connection.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                found.update({key: array('f', vector).tolist() for key, vector in rows})
+            if found:
+                now = time.time()
+                with self.connection:
+                    self.connection.executemany('UPDATE embeddings SET last_used = ? WHERE key = ?',
+                                                [(now, key) for key in found])
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)',
+                [(key, array('f', vector).tobytes(), now) for key, vector in items]
+            )
+            count = self.connection.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+            if count > self.max_entries:
+                self.connection.execute(
+                    'DELETE FROM embeddings WHERE key IN '
+                    '(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+
+    def embed_documents(self, texts):
+        """
+        Embeds a list of texts, only calling the model for texts that are not cached yet.
+
+        :param texts: list
+            The texts to embed.
+        :return: list
+            One embedding vector per text.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            missing_keys = list(missing)
+            batches = [missing_keys[i:i + self.batch_size] for i in range(0, len(missing_keys), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                results = executor.map(
+                    lambda batch: self._embed_batch([missing[key] for key in batch]), batches
+                )
+                for batch, batch_vectors in zip(batches, results):
+                    vectors.update(zip(batch, batch_vectors))
+                    self._store(zip(batch, batch_vectors))
+
+        return [vectors[key] for key in keys]
+
+    @retry(num_retries=4, sleep_between=2, upstream='openai')
+    def _embed_batch(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        """
+        Embeds a single query text through the cache.
+
+        :param text: str
+            The query text.
+        :return: list
+            The embedding vector.
+        """
+        return self.embed_documents([text])[0]
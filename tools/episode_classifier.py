@@ -0,0 +1,252 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+import yaml
+import streamlit as st
+from openai import OpenAI
+from tools.retry import retry
+
+CATEGORY_PROMPTS_PATH = './tools/prompts/multi_category.yaml'
+CLASSIFIER_PROMPT_PATH = './tools/prompts/episode_classifier.md'
+INTERESTS_PATH = './tools/resources/interests.json'
+
+# Seed vocabulary per category; the yaml prompts and the interests taxonomy add to it
+CATEGORY_KEYWORDS = {
+    'story/fiction': ['story', 'stories', 'character', 'characters', 'novel', 'fiction', 'plot', 'chapter',
+                      'narrator', 'once', 'adventure', 'hero', 'villain', 'tale', 'myth', 'film', 'movie',
+                      'book', 'author', 'imagine', 'childhood', 'remember', 'felt', 'mother', 'father'],
+    'educational/personal_growth/career': ['learn', 'learning', 'habit', 'habits', 'career', 'growth', 'goal',
+                                           'goals', 'advice', 'mindset', 'skill', 'skills', 'practice',
+                                           'productivity', 'motivation', 'discipline', 'routine', 'job',
+                                           'mentor', 'health', 'sleep', 'exercise', 'happiness', 'meaning',
+                                           'purpose', 'improve', 'confidence', 'relationships'],
+    'business': ['business', 'company', 'companies', 'market', 'markets', 'customer', 'customers', 'revenue',
+                 'profit', 'startup', 'startups', 'founder', 'investor', 'investors', 'investment', 'sales',
+                 'product', 'pricing', 'strategy', 'growth', 'competition', 'funding', 'valuation', 'ceo',
+                 'margin', 'brand', 'industry', 'economy', 'capital'],
+    'news': ['news', 'government', 'election', 'president', 'minister', 'policy', 'report', 'reported',
+             'announced', 'today', 'yesterday', 'week', 'officials', 'war', 'crisis', 'court', 'law', 'vote',
+             'congress', 'senate', 'country', 'international', 'breaking', 'according', 'politics'],
+    'science/tech': ['science', 'scientific', 'research', 'researchers', 'study', 'technology', 'tech',
+                     'ai', 'artificial', 'intelligence', 'model', 'models', 'data', 'software', 'computer',
+                     'algorithm', 'physics', 'biology', 'energy', 'climate', 'robot', 'robots', 'quantum',
+                     'space', 'innovation', 'engineering', 'experiment', 'future', 'internet'],
+}
+
+# Where each interest of resources/interests.json belongs among the yaml categories
+INTEREST_CATEGORIES = {
+    'Entertainment': 'story/fiction', 'Art': 'story/fiction', 'Comedy': 'story/fiction',
+    'Anime & Movie': 'story/fiction', 'Comics': 'story/fiction', 'Culture': 'story/fiction',
+    'Gaming': 'science/tech', 'Technology': 'science/tech', 'Science & Education': 'science/tech',
+    'Health': 'educational/personal_growth/career', 'Fitness': 'educational/personal_growth/career',
+    'Yoga': 'educational/personal_growth/career', 'Wellness': 'educational/personal_growth/career',
+    'Family': 'educational/personal_growth/career', 'DIY': 'educational/personal_growth/career',
+    'Economics': 'business', 'Entrepreneurship': 'business', 'Politics': 'news',
+}
+
+STOPWORDS = set("""a an the and or but if of to in on at by for with from as is are was were be been being it its
+this that these those you your we our they their he she his her i me my them what which who whom how why when
+where there here not no so do does did have has had can could will would should may might must about into over
+than then also just very more most some any all each other such only own same too up out one two top input
+section called extract list identify highlight discuss content""".split())
+
+WORD = re.compile(r"[a-z][a-z']+")
+
+
+def tokenize(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+@lru_cache(maxsize=4)
+def _load_category_prompts(path, mtime):
+    with open(path, 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
+def load_category_prompts(path=CATEGORY_PROMPTS_PATH):
+    """Parse the category prompts file; parsed once and reused until the file changes."""
+    return _load_category_prompts(path, os.path.getmtime(path))
+
+
+@lru_cache(maxsize=64)
+def _compile_prompt(path, mtime, category, sentence_count, point_count):
+    prompts = _load_category_prompts(path, mtime)
+    sections = prompts['output_sections'][category]
+    steps = "\n\n".join(f"{i + 1}. {instruction.format(sentence_count=sentence_count, point_count=point_count)}"
+                        for i, instruction in enumerate(sections.values()))
+    return (f"{prompts['base_prompts'][category].strip()}\n\n## OUTPUT SECTIONS\n\n{steps}\n\n"
+            f"{prompts['output_instructions'].strip()}\n")
+
+
+def compile_prompt(category, sentence_count=5, point_count=10, path=CATEGORY_PROMPTS_PATH):
+    """Build the system prompt of a category from the yaml; compiled prompts are cached.
+
+    Args:
+        category (str): One of the categories of the yaml, e.g. "business".
+        sentence_count (int): The length of the SUMMARY section, in sentences.
+        point_count (int): The number of items in the top-N sections.
+        path (str): The path of the category prompts file.
+
+    Returns:
+        str: The system prompt.
+    """
+    return _compile_prompt(path, os.path.getmtime(path), category, sentence_count, point_count)
+
+
+@dataclass
+class Classification:
+    """The category chosen for a transcript and how it was chosen."""
+    category: str
+    confidence: float
+    source: str
+    scores: dict = field(default_factory=dict)
+    interests: list = field(default_factory=list)
+
+
+class EpisodeClassifier:
+    """Picks the multi_category prompt for a transcript, locally when it can.
+
+    Every category of the yaml gets a keyword vector built from its seed words, the words of its
+    prompt and of its output section names and descriptions, and the names of the interests
+    mapped to it. Terms are weighted by IDF across the categories, so words every category shares
+    count for little. A transcript is scored by the cosine similarity of its (log-scaled) term
+    frequencies with each category vector.
+    Confidence is the margin of the best score over the runner-up, relative to the best; only
+    when it is below ``min_confidence`` (or nothing matched) is the LLM classifier of
+    ``episode_classifier.md`` called, with the start of the transcript.
+
+    Attributes:
+        categories (list): The category names, in yaml order.
+        min_confidence (float): The margin below which the LLM decides.
+        llm_model (str): The model used for the fallback.
+        llm_words (int): How many words of the transcript are sent to the fallback.
+    """
+    def __init__(self, prompts_path=CATEGORY_PROMPTS_PATH, interests_path=INTERESTS_PATH,
+                 classifier_prompt_path=CLASSIFIER_PROMPT_PATH, min_confidence=0.2,
+                 llm_model="gpt-4o-mini", llm_words=1500):
+        self.prompts_path = prompts_path
+        self.classifier_prompt_path = classifier_prompt_path
+        self.min_confidence = min_confidence
+        self.llm_model = llm_model
+        self.llm_words = llm_words
+        self.client = None
+        self.logger = logging.getLogger(__name__)
+
+        prompts = load_category_prompts(prompts_path)
+        self.categories = list(prompts['base_prompts'])
+        with open(interests_path, 'r', encoding='utf-8') as file:
+            self.interests = json.load(file)['interests_with_icons']
+
+        term_counts = {}
+        for category in self.categories:
+            text = " ".join([prompts['base_prompts'][category],
+                             " ".join(f"{name} {re.sub(r'{[a-z_]+}', '', description)}"
+                                      for name, description in prompts['output_sections'].get(category, {}).items()),
+                             " ".join(CATEGORY_KEYWORDS.get(category, []) * 3),
+                             " ".join([name for name, mapped in INTEREST_CATEGORIES.items() if mapped == category] * 2)])
+            term_counts[category] = Counter(tokenize(text.replace('_', ' ')))
+
+        document_frequency = Counter(term for counts in term_counts.values() for term in counts)
+        self.vectors = {}
+        for category, counts in term_counts.items():
+            vector = {term: (1 + math.log(count)) * math.log(1 + len(self.categories) / document_frequency[term])
+                      for term, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            self.vectors[category] = {term: weight / norm for term, weight in vector.items()}
+
+    def score(self, text):
+        """Score a transcript against every category.
+
+        Args:
+            text (str): The transcript.
+
+        Returns:
+            dict: The cosine similarity per category.
+        """
+        counts = Counter(tokenize(text))
+        weights = {term: 1 + math.log(count) for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {category: sum(weights.get(term, 0.0) * weight for term, weight in vector.items()) / norm
+                for category, vector in self.vectors.items()}
+
+    def match_interests(self, text, limit=3):
+        """Return the interests of the taxonomy mentioned most often in a transcript."""
+        counts = Counter(tokenize(text))
+        matches = []
+        for interest in self.interests:
+            hits = sum(counts[term] for term in tokenize(interest.replace('&', ' ')))
+            if hits:
+                matches.append((hits, interest))
+        return [interest for _, interest in sorted(matches, reverse=True)[:limit]]
+
+    def classify(self, text):
+        """Classify a transcript into one of the yaml categories.
+
+        Args:
+            text (str): The transcript.
+
+        Returns:
+            Classification: The category, its confidence and whether it came from the local
+                scorer or the LLM fallback.
+        """
+        scores = self.score(text)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        confidence = (best - runner_up) / best if best > 0 else 0.0
+        interests = self.match_interests(text)
+
+        if confidence >= self.min_confidence:
+            return Classification(ranked[0], confidence, 'local', scores, interests)
+
+        try:
+            category = self._classify_with_llm(text)
+        except Exception as e:
+            self.logger.warning(f"LLM classification failed, using the local guess: {e}")
+            category = None
+        if category is None:
+            return Classification(ranked[0], confidence, 'local', scores, interests)
+        return Classification(category, confidence, 'llm', scores, interests)
+
+    @retry(num_retries=3, upstream='openai')
+    def _classify_with_llm(self, text):
+        if self.client is None:
+            self.client = OpenAI(api_key=st.secrets["openai"]["api_key"], max_retries=0)
+        with open(self.classifier_prompt_path, 'r', encoding='utf-8') as file:
+            system_content = file.read()
+        excerpt = " ".join(text.split()[:self.llm_words])
+        response = self.client.chat.completions.create(model=self.llm_model,
+        messages=[{"role": "system", "content": system_content}, {"role": "user", "content": excerpt}],
+        temperature=0.0,
+        max_tokens=20
+        )
+        answer = response.choices[0].message.content.strip().strip("'\"`.").lower()
+        for category in self.categories:
+            if answer == category or answer.startswith(category.split('/')[0]):
+                return category
+        self.logger.warning(f"LLM returned an unknown category: {answer}")
+        return None
+
+
+def route_prompt(text, classifier=None, sentence_count=5, point_count=10):
+    """Classify a transcript and return its classification with the compiled category prompt.
+
+    Args:
+        text (str): The transcript.
+        classifier (EpisodeClassifier): A classifier to reuse; a new one is built if None.
+        sentence_count (int): The length of the SUMMARY section, in sentences.
+        point_count (int): The number of items in the top-N sections.
+
+    Returns:
+        tuple: The Classification and the system prompt, e.g. for
+            ``TranscriptSummarizer(system_content=prompt)``.
+    """
+    classifier = classifier or EpisodeClassifier()
+    classification = classifier.classify(text)
+    return classification, compile_prompt(classification.category, sentence_count, point_count,
+                                          path=classifier.prompts_path)
@@ -1,6 +1,92 @@
 import logging
 import os
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+_path_locks = {}
+_path_locks_lock = threading.Lock()
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Create a requests session with a connection pool sized for concurrent downloads.
+
+    Args:
+        pool_size (int): The maximum number of pooled connections per host.
+
+    Returns:
+        requests.Session: A session that reuses connections between requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def path_lock(file_path):
+    """Return the process-wide lock of a download target, so one file is never written by two downloads."""
+    key = os.path.abspath(file_path)
+    with _path_locks_lock:
+        if key not in _path_locks:
+            _path_locks[key] = threading.RLock()
+        return _path_locks[key]
+
+
+def _content_range_total(response):
+    """Return the total size from a ``Content-Range`` header (e.g. ``bytes */1234``), if any."""
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def stream_to_file(session, url, file_path, chunk_size=DEFAULT_CHUNK_SIZE, resume=True, timeout=30):
+    """Stream the body of a URL to disk in fixed-size chunks.
+
+    The body is written to ``file_path + '.part'`` and renamed once complete. If a partial
+    file is left over from an interrupted download, the transfer is resumed with an HTTP
+    Range request; servers that ignore the range get a fresh download. A 416 answer only
+    completes the download if its ``Content-Range`` total matches the partial file's size.
+    Concurrent downloads of the same path are serialised, so they never append to the same
+    partial file.
+
+    Args:
+        session (requests.Session): The session used to issue the request.
+        url (str): The URL to download.
+        file_path (str): The final path of the downloaded file.
+        chunk_size (int): The number of bytes written per chunk.
+        resume (bool): Whether to resume from an existing partial file.
+        timeout (int): Connect/read timeout in seconds.
+
+    Returns:
+        requests.Response: The (closed) response of the final request.
+    """
+    with path_lock(file_path):
+        part_path = f"{file_path}.part"
+        offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 416 and offset:
+                # Only complete if the server reports exactly the size we already have ("bytes */<size>");
+                # otherwise the remote file changed or the partial file is corrupt, so start over
+                if _content_range_total(response) == offset:
+                    os.replace(part_path, file_path)
+                    return response
+                os.remove(part_path)
+                return stream_to_file(session, url, file_path, chunk_size=chunk_size, resume=False, timeout=timeout)
+            if not response.ok:
+                return response
+            mode = 'ab' if offset and response.status_code == 206 else 'wb'
+            with open(part_path, mode) as file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        file.write(chunk)
+        os.replace(part_path, file_path)
+        return response
+
 
 class EpisodeDownloader:
     """Handles downloading of podcast episodes.
@@ -8,11 +94,17 @@ class EpisodeDownloader:
     Attributes:
         parent_folder (str): The parent directory for downloaded episodes.
         verbose (bool): Flag to enable verbose logging.
+        chunk_size (int): The number of bytes written to disk per chunk.
+        max_workers (int): The maximum number of concurrent downloads in ``download_many``.
     """
-    def __init__(self, parent_folder: str, verbose: bool = False):
+    def __init__(self, parent_folder: str, verbose: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_workers: int = 4):
         self.parent_folder = parent_folder
         self.logger = logging.getLogger(__name__)
         self.verbose = verbose
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.session = create_session(pool_size=max_workers)
 
     def download_single_episode(self, url, title, feed_title):
         """Download a single episode.
@@ -26,25 +118,74 @@ class EpisodeDownloader:
             str: The full path of the downloaded episode.
 
         Creates an MP3 file in the directory ./audio/feed_title/ named after the episode title.
+        The body is streamed to disk so memory use does not grow with the episode length, and
+        an interrupted download is resumed on the next call.
         """
-        # TODO;
-        # resolve the issue of the episode title being not path friendly
         episode_dir = self._create_episode_dir(feed_title)
-        response = requests.get(url)
-        safe_title = "".join([c for c in feed_title if c.isalnum() or c in " -_"]).rstrip()
-        safe_title = safe_title.replace(",", "").replace("/", "")
-        file_path = os.path.join(episode_dir, f"{safe_title}.mp3")
-        if response.ok:
-            with open(file_path, 'wb') as file:
-                file.write(response.content)
+        file_path = os.path.join(episode_dir, f"{self._safe_name(title)}.mp3")
+        # Held across the check and the download: a second request for the same episode waits
+        # for the first one and then finds the finished file
+        with path_lock(file_path):
+            if os.path.exists(file_path):
+                if self.verbose:
+                    self.logger.info(f"Episode already downloaded: {title}")
+                return file_path
+
+            try:
+                response = stream_to_file(self.session, url, file_path, chunk_size=self.chunk_size)
+            except requests.RequestException as e:
                 if self.verbose:
-                    self.logger.info(f"Downloaded episode: {title}")
+                    self.logger.error(f"Failed to download episode: {title} ({e})")
+                return None
+
+        if response.ok or response.status_code == 416:
+            if self.verbose:
+                self.logger.info(f"Downloaded episode: {title}")
             return file_path
         else:
             if self.verbose:
                 self.logger.error(f"Failed to download episode: {title}")
             return None
 
+    def download_many(self, episodes, feed_title, max_workers=None):
+        """Download several episodes concurrently.
+
+        Args:
+            episodes (list): Episode instances with ``mp3_url`` and ``title`` attributes.
+            feed_title (str): The title of the podcast feed.
+            max_workers (int, optional): Overrides the downloader's concurrency limit.
+
+        Returns:
+            dict: A mapping of episode title to the downloaded file path (None on failure).
+        """
+        max_workers = max_workers or self.max_workers
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_title = {
+                executor.submit(self.download_single_episode, episode.mp3_url, episode.title, feed_title): episode.title
+                for episode in episodes if episode.mp3_url
+            }
+            for future in as_completed(future_to_title):
+                title = future_to_title[future]
+                try:
+                    results[title] = future.result()
+                except Exception as e:
+                    self.logger.error(f"Download of {title} generated an exception: {e}")
+                    results[title] = None
+        return results
+
+    @staticmethod
+    def _safe_name(name):
+        """Strip characters that are not safe to use in a file name.
+
+        Args:
+            name (str): The raw name.
+
+        Returns:
+            str: The sanitised name.
+        """
+        return "".join([c for c in name if c.isalnum() or c in " -_"]).rstrip()
+
     def _create_episode_dir(self, feed_title):
         """Create a directory for a podcast feed.
 
@@ -54,7 +195,6 @@ class EpisodeDownloader:
         Returns:
             str: The path to the created directory.
         """
-        safe_title = "".join([c for c in feed_title if c.isalnum() or c in " -_"]).rstrip()
-        episode_dir = os.path.join(self.parent_folder, safe_title)
+        episode_dir = os.path.join(self.parent_folder, self._safe_name(feed_title))
         os.makedirs(episode_dir, exist_ok=True)
-        return episode_dir
\ No newline at end of file
+        return episode_dir
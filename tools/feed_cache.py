@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import threading
+import time
+import requests
+from tools.retry import retry
+
+
+class FeedCache:
+    """A persistent cache of a parsed podcast feed, refreshed with conditional requests.
+
+    The parsed episode list is stored on disk together with the feed's ETag and Last-Modified
+    headers. Once the cache is older than ``ttl_s`` it is refreshed in a background thread with
+    ``If-None-Match``/``If-Modified-Since``, so a 304 costs no download or parse, and callers
+    keep being served the last good episode list while the refresh runs or if the feed host is
+    unreachable. Only the very first load, with nothing on disk, waits for the network.
+
+    Attributes:
+        feed_url (str): The URL of the RSS feed.
+        parser (Callable): Turns the raw feed bytes into a JSON-serialisable list of episodes.
+        cache_path (str): The path of the on-disk cache file.
+        ttl_s (float): How long a fetched feed is considered fresh, in seconds.
+    """
+    def __init__(self, feed_url, parser, cache_path='./cache/feed.json', ttl_s=15 * 60, timeout=10):
+        self.feed_url = feed_url
+        self.parser = parser
+        self.cache_path = cache_path
+        self.ttl_s = ttl_s
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.state = self._load()
+
+    def _load(self):
+        """Read the cache file.
+
+        Returns:
+            dict: The cached state, or None if there is no usable cache.
+        """
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, state):
+        """Atomically write the cache file.
+
+        Args:
+            state (dict): The state to persist.
+        """
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.cache_path)
+
+    def refresh(self):
+        """Fetch the feed with a conditional request and update the cache.
+
+        Returns:
+            bool: True if the cache holds an episode list afterwards.
+        """
+        state = self.state or {}
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+        try:
+            response = self._fetch(headers)
+            if response.status_code == 304 and state:
+                new_state = dict(state, fetched_at=time.time())
+            else:
+                response.raise_for_status()
+                new_state = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                    'episodes': self.parser(response.content),
+                }
+        except Exception as e:
+            self.logger.warning(f"Feed refresh failed, serving cached episodes: {e}")
+            return bool(self.state)
+
+        with self.lock:
+            self.state = new_state
+        self._save(new_state)
+        return True
+
+    @retry(num_retries=3, sleep_between=1, upstream='feed')
+    def _fetch(self, headers):
+        response = requests.get(self.feed_url, headers=headers, timeout=self.timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+        threading.Thread(target=run, daemon=True, name='feed-cache-refresh').start()
+
+    def get_episodes(self):
+        """Return the cached episode list, refreshing it in the background once it is stale.
+
+        Returns:
+            list: The parsed episodes, or an empty list if the feed was never fetched.
+        """
+        if self.state is None:
+            self.refresh()
+        elif time.time() - self.state.get('fetched_at', 0) > self.ttl_s:
+            self._refresh_in_background()
+        return self.state['episodes'] if self.state else []
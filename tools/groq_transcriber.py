@@ -1,10 +1,11 @@
 import os
 import logging
 from groq import Groq
-from pydub import AudioSegment
-import tempfile
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from audio_chunker import AudioChunker, AudioChunk
+from chunk_scheduler import ChunkScheduler, get_scheduler
+from episode_downloader import create_session, stream_to_file
+from transcript_cache import TranscriptCache
+from retry import retry
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -13,20 +14,31 @@ class GroqTranscriber:
     A class to handle audio transcription using Groq's API.
     """
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, scheduler: ChunkScheduler = None, cache: TranscriptCache = None):
         """
         Initialize the GroqTranscriber.
 
         :param api_key: The API key for Groq.
         :type api_key: str
-        """
-        self.client = Groq(api_key=api_key)
+        :param scheduler: Scheduler for chunk requests; defaults to the process-wide one.
+        :type scheduler: ChunkScheduler
+        :param cache: Transcript cache consulted before downloading an episode; defaults to ``./cache/transcripts``.
+        :type cache: TranscriptCache
+        """
+        # Retries are handled by the scheduler and tools.retry, not by the SDK
+        self.client = Groq(api_key=api_key, max_retries=0)
+        self.scheduler = scheduler or get_scheduler()
         self.model = 'distil-whisper-large-v3-en'
+        self.session = create_session()
+        self.cache = cache or TranscriptCache()
 
     def transcribe_episode(self, episode_url: str, episode_title: str, podcast_title: str) -> str:
         """
         Transcribe an entire podcast episode.
 
+        If the episode was already transcribed with the same model, the cached transcript is
+        returned without downloading the audio.
+
         :param episode_url: URL of the episode audio file.
         :type episode_url: str
         :param episode_title: Title of the episode.
@@ -36,8 +48,15 @@ class GroqTranscriber:
         :return: Path to the saved transcription file.
         :rtype: str
         """
+        cache_key = self.cache.episode_key(episode_url, self.model, session=self.session)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            logging.info(f"Transcript cache hit for episode: {episode_title}")
+            return self._save_transcription(cached['text'], podcast_title, episode_title)
+
         audio_file = self._download_audio(episode_url, podcast_title, episode_title)
         transcription = self.transcribe_long_audio(audio_file)
+        self.cache.put(cache_key, transcription, {'episode_title': episode_title, 'podcast_title': podcast_title})
         transcription_file_path = self._save_transcription(transcription, podcast_title, episode_title)
         os.remove(audio_file)
         logging.info(f"Successfully transcribed episode: {episode_title} from podcast: {podcast_title}")
@@ -45,7 +64,7 @@ class GroqTranscriber:
 
     def _download_audio(self, url: str, podcast_title: str, episode_title: str) -> str:
         """
-        Download the audio file from the given URL.
+        Download the audio file from the given URL, streaming it to disk in chunks.
 
         :param url: URL of the audio file.
         :type url: str
@@ -57,13 +76,11 @@ class GroqTranscriber:
         :rtype: str
         :raises Exception: If the download fails.
         """
-        response = requests.get(url)
-        if response.status_code == 200:
-            audio_dir = f"./audio/{podcast_title}"
-            os.makedirs(audio_dir, exist_ok=True)
-            audio_file = f"{audio_dir}/{episode_title}.mp3"
-            with open(audio_file, "wb") as f:
-                f.write(response.content)
+        audio_dir = f"./audio/{podcast_title}"
+        os.makedirs(audio_dir, exist_ok=True)
+        audio_file = f"{audio_dir}/{episode_title}.mp3"
+        response = stream_to_file(self.session, url, audio_file)
+        if response.ok or response.status_code == 416:
             logging.info(f"Downloaded audio file: {audio_file}")
             return audio_file
         else:
@@ -90,6 +107,7 @@ class GroqTranscriber:
         logging.info(f"Saved transcription to: {transcription_file}")
         return transcription_file
 
+    @retry(num_retries=4, sleep_between=2, upstream='groq')
     def transcribe_audio(self, audio_file: str) -> str:
         """
         Transcribe a single audio file using Groq's API.
@@ -106,63 +124,101 @@ class GroqTranscriber:
             )
         return transcription.text
 
-    def transcribe_long_audio(self, audio_file: str, chunk_length_ms: int = 10 * 60 * 1000) -> str:
+    def transcribe_long_audio(self, audio_file: str, chunk_length_ms: int = 10 * 60 * 1000, mode: str = 'copy') -> str:
         """
         Transcribe a long audio file by splitting it into chunks and processing them in parallel.
 
+        Chunks are cut straight from the compressed file into memory by :class:`AudioChunker`, so
+        the episode is never decoded as a whole and no temporary chunk files are written. Chunk
+        requests go through the shared :class:`ChunkScheduler`, which enforces the API quota
+        across all episodes in the process and retries failed chunks individually.
+
         :param audio_file: Path to the audio file.
         :type audio_file: str
         :param chunk_length_ms: Length of each chunk in milliseconds.
         :type chunk_length_ms: int
+        :param mode: Chunking mode, ``copy`` (MP3 stream copy) or ``flac`` (16 kHz mono).
+        :type mode: str
         :return: The complete transcribed text.
         :rtype: str
+        :raises RuntimeError: If any chunk still fails after the scheduler's retries.
+        """
+        return " ".join(segment['text'] for segment in self.iter_long_audio(audio_file, chunk_length_ms, mode))
+
+    def iter_long_audio(self, audio_file: str, chunk_length_ms: int = 10 * 60 * 1000, mode: str = 'copy'):
         """
-        audio = AudioSegment.from_file(audio_file)
-        chunks = self._split_audio(audio, chunk_length_ms)
+        Transcribe a long audio file chunk by chunk, yielding each segment in order as soon as it is done.
 
-        with ThreadPoolExecutor(max_workers=min(len(chunks), 10)) as executor:
-            future_to_chunk = {executor.submit(self._transcribe_chunk, chunk, i): i for i, chunk in enumerate(chunks)}
-            transcriptions = [None] * len(chunks)
+        All chunks are submitted to the scheduler up front; segments are yielded in audio order,
+        so a consumer can start on the beginning of the episode while later chunks are in flight.
 
-            for future in as_completed(future_to_chunk):
-                chunk_index = future_to_chunk[future]
+        :param audio_file: Path to the audio file.
+        :type audio_file: str
+        :param chunk_length_ms: Length of each chunk in milliseconds.
+        :type chunk_length_ms: int
+        :param mode: Chunking mode, ``copy`` (MP3 stream copy) or ``flac`` (16 kHz mono).
+        :type mode: str
+        :return: Generator of dicts with ``index``, ``start_s``, ``end_s`` and ``text``.
+        :rtype: Generator
+        :raises RuntimeError: If a chunk still fails after the scheduler's retries.
+        """
+        chunker = AudioChunker(chunk_length_s=chunk_length_ms / 1000, mode=mode)
+        chunk_mode, windows = chunker.plan(audio_file)
+
+        futures = [
+            self.scheduler.submit(self._transcribe_window, chunker, audio_file, i, start_s, duration_s, chunk_mode,
+                                  audio_seconds=duration_s)
+            for i, (start_s, duration_s) in enumerate(windows)
+        ]
+        try:
+            for chunk_index, (future, (start_s, duration_s)) in enumerate(zip(futures, windows)):
                 try:
-                    transcriptions[chunk_index] = future.result()
+                    text = future.result()
                 except Exception as exc:
                     logging.error(f'Chunk {chunk_index} generated an exception: {exc}')
+                    raise RuntimeError(f"Failed to transcribe chunk {chunk_index} of {audio_file}") from exc
+                yield {'index': chunk_index, 'start_s': start_s, 'end_s': start_s + duration_s, 'text': text}
+        finally:
+            for future in futures:
+                future.cancel()
 
-        return " ".join(transcriptions)
-
-    def _transcribe_chunk(self, chunk: AudioSegment, chunk_index: int) -> str:
+    def _transcribe_window(self, chunker: AudioChunker, audio_file: str, chunk_index: int,
+                           start_s: float, duration_s: float, mode: str) -> str:
         """
-        Transcribe a single chunk of audio.
+        Extract a single window of the audio file into memory and transcribe it.
 
-        :param chunk: The audio chunk to transcribe.
-        :type chunk: AudioSegment
+        :param chunker: The chunker used to cut the window.
+        :type chunker: AudioChunker
+        :param audio_file: Path to the audio file.
+        :type audio_file: str
         :param chunk_index: The index of the chunk.
         :type chunk_index: int
+        :param start_s: Offset of the chunk in seconds.
+        :type start_s: float
+        :param duration_s: Length of the chunk in seconds.
+        :type duration_s: float
+        :param mode: The chunking mode.
+        :type mode: str
         :return: The transcribed text for the chunk.
         :rtype: str
         """
-        logging.info(f"Transcribing chunk {chunk_index + 1}...")
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            chunk.export(temp_file.name, format="mp3")
-            transcription = self.transcribe_audio(temp_file.name)
-        os.unlink(temp_file.name)
-        return transcription
+        chunk = chunker.extract(audio_file, chunk_index, start_s, duration_s, mode)
+        return self._transcribe_chunk(chunk)
 
-    def _split_audio(self, audio: AudioSegment, chunk_length_ms: int) -> list:
+    # A single attempt: the scheduler retries chunks, this only feeds the shared Groq circuit breaker
+    @retry(num_retries=1, upstream='groq')
+    def _transcribe_chunk(self, chunk: AudioChunk) -> str:
         """
-        Split the audio into chunks.
+        Transcribe a single in-memory chunk of audio.
 
-        :param audio: The full audio to split.
-        :type audio: AudioSegment
-        :param chunk_length_ms: Length of each chunk in milliseconds.
-        :type chunk_length_ms: int
-        :return: List of audio chunks.
-        :rtype: list
+        :param chunk: The audio chunk to transcribe.
+        :type chunk: AudioChunk
+        :return: The transcribed text for the chunk.
+        :rtype: str
         """
-        chunks = []
-        for i in range(0, len(audio), chunk_length_ms):
-            chunks.append(audio[i:i+chunk_length_ms])
-        return chunks
\ No newline at end of file
+        logging.info(f"Transcribing chunk {chunk.index + 1}...")
+        transcription = self.client.audio.transcriptions.create(
+            file=(chunk.filename, chunk.data),
+            model=self.model,
+        )
+        return transcription.text
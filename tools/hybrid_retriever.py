@@ -0,0 +1,132 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+QUESTION_WORDS = {'what', 'why', 'how', 'who', 'when', 'where', 'which', 'does', 'did', 'is', 'are', 'can',
+                  'should', 'could', 'would', 'explain', 'summarize', 'describe', 'tell'}
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens; numbers are kept as tokens.
+
+    :param text: str
+        The text to tokenize.
+    :return: list
+        The tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """An in-memory Okapi BM25 index over a list of documents, backed by an inverted index."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Builds the index.
+
+        :param documents: list
+            The documents to index.
+        :param k1: float, optional
+            Term frequency saturation.
+        :param b: float, optional
+            Document length normalisation.
+        """
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for index, document in enumerate(documents):
+            counts = Counter(tokenize(document.page_content))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings[term].append((index, count))
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        total = len(documents)
+        self.idf = {term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for term, postings in self.postings.items()}
+
+    def search(self, query, k=4):
+        """
+        Scores the documents against a query.
+
+        :param query: str
+            The query.
+        :param k: int, optional
+            Number of results.
+        :return: list
+            Up to ``k`` ``(document, score)`` tuples, best first.
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, count in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+                scores[index] += idf * count * (self.k1 + 1) / (count + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.documents[index], score) for index, score in best]
+
+
+def is_keyword_query(query, max_terms=4):
+    """
+    Decides whether a query is a keyword lookup (names, numbers, short phrases) rather than a question.
+
+    :param query: str
+        The user query.
+    :param max_terms: int, optional
+        Queries with more terms than this are treated as questions.
+    :return: bool
+        True for keyword-style queries.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return False
+    if query.strip().startswith('"') and query.strip().endswith('"'):
+        return True
+    return '?' not in query and len(tokens) <= max_terms and tokens[0] not in QUESTION_WORDS
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 and vector search results with reciprocal rank fusion.
+
+    Keyword-style queries take a lexical-only fast path that skips the embedding call
+    entirely, as long as BM25 finds any match.
+    """
+
+    bm25: Any
+    vector_retriever: Any
+    k: int = 4
+    rrf_k: int = 60
+    mode: str = 'auto'
+
+    def uses_vector_search(self, query: str) -> bool:
+        """Whether retrieving ``query`` will embed it, i.e. it does not take the lexical fast path."""
+        if self.mode == 'lexical':
+            return False
+        return not (self.mode == 'auto' and is_keyword_query(query) and self.bm25.search(query, k=1))
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        lexical = self.bm25.search(query, k=self.k * 2)
+        if self.mode == 'lexical' or (self.mode == 'auto' and lexical and is_keyword_query(query)):
+            return [document for document, _ in lexical[:self.k]]
+        vector = self.vector_retriever.invoke(query)
+        if self.mode == 'vector':
+            return vector[:self.k]
+
+        fused = {}
+        scores = defaultdict(float)
+        for results in ([document for document, _ in lexical], vector):
+            for rank, document in enumerate(results):
+                key = document.page_content
+                fused.setdefault(key, document)
+                scores[key] += 1 / (self.rrf_k + rank + 1)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [fused[key] for key in ranked]
@@ -0,0 +1,22 @@
+-- Dedicated, indexed episode key for transcripts and summaries, plus a single-query
+-- availability lookup used by SupabaseClient.get_availability.
+
+alter table transcripts
+    add column if not exists episode_title text generated always as (metadata->>'episode_title') stored;
+create index if not exists transcripts_episode_title_idx on transcripts (episode_title);
+
+alter table summaries
+    add column if not exists episode_title text generated always as (metadata->>'episode_title') stored;
+create index if not exists summaries_episode_title_idx on summaries (episode_title);
+
+create or replace function episode_availability()
+returns table (episode_title text, has_transcript boolean, has_summary boolean)
+language sql stable
+as $$
+    select coalesce(t.episode_title, s.episode_title) as episode_title,
+           t.episode_title is not null as has_transcript,
+           s.episode_title is not null as has_summary
+    from (select distinct episode_title from transcripts where episode_title is not null) t
+    full outer join (select distinct episode_title from summaries where episode_title is not null) s
+        on t.episode_title = s.episode_title;
+$$;
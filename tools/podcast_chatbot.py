@@ -1,35 +1,120 @@
 import os
 import time
+import logging
 import json
+import hashlib
+import threading
+import chromadb
 import streamlit as st
-from langchain_community.document_loaders import TextLoader
+from chromadb.config import Settings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from tools.embedding_cache import CachedEmbeddings
+from tools.hybrid_retriever import BM25Index, HybridRetriever
+from tools.transcript_compactor import TranscriptCompactor
+
+
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 150
+
+
+_chroma_clients = {}
+_chroma_clients_lock = threading.Lock()
+
+
+def get_chroma_client(persist_directory='./chroma/'):
+    """
+    Returns the process-wide Chroma client of a persist directory.
+
+    Every collection in a directory must go through the same client: each duckdb+parquet client
+    rewrites the whole store from its own in-memory copy when it persists, so separate clients
+    would overwrite each other's collections.
+
+    :param persist_directory: str, optional
+        Directory of the persistent Chroma store.
+    :return: chromadb.API
+        The shared client.
+    """
+    with _chroma_clients_lock:
+        key = os.path.abspath(persist_directory)
+        if key not in _chroma_clients:
+            os.makedirs(persist_directory, exist_ok=True)
+            _chroma_clients[key] = chromadb.Client(Settings(chroma_db_impl="duckdb+parquet",
+                                                            persist_directory=persist_directory))
+        return _chroma_clients[key]
+
+
+def create_embeddings():
+    """
+    Creates the OpenAI embeddings model, wrapped in the local chunk embedding cache.
+
+    :return: CachedEmbeddings
+        The cached embeddings model.
+    """
+    # Retries happen in CachedEmbeddings (tools.retry), not in the SDK
+    base_embeddings = OpenAIEmbeddings(openai_api_key=st.secrets["openai"]["api_key"], max_retries=0)
+    return CachedEmbeddings(base_embeddings, model_name=base_embeddings.model)
+
+
+def transcript_hash(transcript_text):
+    """
+    Computes a stable content hash of a transcript.
+
+    :param transcript_text: str
+        The transcript text.
+    :return: str
+        The hex SHA-256 digest of the transcript.
+    """
+    return hashlib.sha256(transcript_text.encode('utf-8')).hexdigest()
 
 
 class ChatBotInterface:
-    def __init__(self, transcript_path, model='gpt-4o'):
+    def __init__(self, transcript_path=None, model='gpt-4o', transcript_text=None, persist_directory='./chroma/',
+                 retrieval_mode='auto', answer_cache=None, compaction='off'):
         """
         Initializes the chat bot interface with necessary paths and model.
 
-        :param transcript_path: str
+        :param transcript_path: str, optional
             Path to the text file containing the transcripts.
         :param model: str, optional
             The model identifier for the OpenAI API (default is 'gpt-3.5-turbo-0125').
+        :param transcript_text: str, optional
+            The transcript itself; used instead of reading ``transcript_path``.
+        :param persist_directory: str, optional
+            Directory of the persistent Chroma store holding one collection per transcript.
+        :param retrieval_mode: str, optional
+            'auto' (hybrid, with a lexical-only path for keyword queries), 'hybrid', 'lexical' or 'vector'.
+        :param answer_cache: SemanticAnswerCache, optional
+            Shared cache of answers to similar questions about the same transcript.
+        :param compaction: str, optional
+            How the transcript is compacted before it is chunked and embedded ('off' keeps it
+            verbatim, so answers can quote it exactly; 'standard' or 'aggressive').
         """
+        if transcript_text is None and transcript_path is not None:
+            with open(transcript_path, 'r', encoding='utf-8') as file:
+                transcript_text = file.read()
+        if transcript_text is not None:
+            # Fewer chunks to embed and fewer context tokens per question; the content hash
+            # below is of the compacted text, so each compaction mode gets its own collection
+            transcript_text = TranscriptCompactor(model=model, mode=compaction).compact(transcript_text).text
         self.transcript_path = transcript_path
+        self.transcript_text = transcript_text
+        self.transcript_hash = transcript_hash(transcript_text) if transcript_text is not None else None
+        self.persist_directory = persist_directory
+        self.retrieval_mode = retrieval_mode
+        self.answer_cache = answer_cache
         self.model = ChatOpenAI(
             model_name=model, 
             temperature=0,
             openai_api_key=st.secrets["openai"]["api_key"]
         )
         self.vectordb = self.setup_vector_db()
-        self.qa_chain = self.setup_qa_chain()
+        self.retriever = self.setup_retriever()
+        self.qa_prompt = self.setup_qa_prompt()
 
     def load_and_split_transcript(self):
         """
@@ -38,74 +123,149 @@ class ChatBotInterface:
         :return: list
             List of text chunks.
         """
-        transcript = TextLoader(self.transcript_path).load()
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
-        return text_splitter.split_documents(transcript)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        metadata = {'source': self.transcript_path or self.transcript_hash}
+        return text_splitter.create_documents([self.transcript_text], metadatas=[metadata])
 
-    # TODO:
-    # see how to check the documents present in the db and not load if already present
     def setup_vector_db(self):
         """
-        Creates and returns a Chroma vector database from the split transcripts if not already loaded.
+        Opens the Chroma collection for this transcript, building it only if it does not exist yet.
+
+        Each transcript gets its own collection named after its content hash, so an episode that
+        was embedded once (in any session) is reused without any embedding calls. The number of
+        chunks is recorded in the collection metadata once it is fully built; a collection whose
+        count does not match (e.g. left half-built by a crash) is rebuilt. Chunk embeddings go
+        through the local embedding cache.
 
         :return: Chroma
             An instance of Chroma vector database.
         """
-        persist_directory = './chroma/'
+        def open_collection():
+            return Chroma(
+                client=get_chroma_client(self.persist_directory),
+                collection_name=f"episode-{self.transcript_hash[:32]}",
+                embedding_function=create_embeddings(),
+                persist_directory=self.persist_directory
+            )
 
-        # Only create vector DB if it does not already exist
-        if not os.path.exists(persist_directory):
-            os.makedirs(persist_directory)
+        vectordb = open_collection()
+        count = vectordb._collection.count()
+        if count and count == (vectordb._collection.metadata or {}).get('chunks'):
+            return vectordb
+        if count:
+            logging.warning(f"Rebuilding incomplete collection {vectordb._collection.name}")
+            vectordb.delete_collection()
+            vectordb = open_collection()
 
         documents = self.load_and_split_transcript()
-        embeddings = OpenAIEmbeddings(openai_api_key=st.secrets["openai"]["api_key"])
-        vectordb = Chroma.from_documents(documents=documents, embedding=embeddings, persist_directory=persist_directory)
-        
+        vectordb.add_documents(documents)
+        vectordb._collection.modify(metadata={'chunks': len(documents)})
+        vectordb.persist()
         return vectordb
 
-    def setup_qa_chain(self):
+    def setup_retriever(self):
+        """
+        Creates the retriever that supplies context to the Q&A chain.
+
+        Vector search is fused with a local BM25 index over the same chunks, which catches exact
+        names and numbers; keyword-style queries are answered from BM25 alone, without an
+        embedding call.
+
+        :return: HybridRetriever
+            A hybrid lexical and vector retriever.
+        """
+        return HybridRetriever(
+            bm25=BM25Index(self.load_and_split_transcript()),
+            vector_retriever=self.vectordb.as_retriever(search_kwargs={'k': 8}),
+            k=4,
+            mode=self.retrieval_mode
+        )
+
+    def setup_qa_prompt(self):
         """
-        Sets up the retrieval-based Q&A chain.
+        Sets up the prompt used to answer questions from the retrieved context.
 
-        :return: RetrievalQA
-            An instance of the RetrievalQA chain.
+        :return: PromptTemplate
+            The Q&A prompt.
         """
         template = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer. Use three sentences maximum. Keep the answer as concise as possible.
             {context}
             Question: {question}
             Helpful Answer:"""
-        qa_chain_prompt = PromptTemplate.from_template(template)
-
-        return RetrievalQA.from_chain_type(
-            self.model,
-            retriever=self.vectordb.as_retriever(),
-            return_source_documents=False,
-            chain_type_kwargs={"prompt": qa_chain_prompt}
-        )
+        return PromptTemplate.from_template(template)
     
-    def reply_generator(self, query):
+    def reply_generator(self, query, scope=None, metrics=None):
         """
-        Generates a reply to the user query using the QA chain.
+        Generates a reply to the user query, streaming tokens from the chat model as they arrive.
+
+        Retrieval runs first; generation starts as soon as the context is known. Retrieval time,
+        time to first token and total latency are logged and written into ``metrics``; the bot is
+        shared across sessions, so each caller passes its own dict.
+        With an answer cache and a scope, a near-identical earlier question about the same
+        transcript is answered from the cache without retrieval or generation.
 
         :param query: str
             The user query.
-        :return: str
-            The reply generated by the QA chain.
+        :param scope: str, optional
+            The episode the question is about, used to scope the answer cache.
+        :param metrics: dict, optional
+            Filled with this reply's metrics once the generator is exhausted.
+        :return: Generator
+            The reply, token by token.
         """
-        reply = self.qa_chain({"query": query})['result']
+        start = time.perf_counter()
+        metrics = {} if metrics is None else metrics
+        use_cache = self.answer_cache is not None and scope is not None
+        embedding = None
+        # Keyword queries skip the embedding call in retrieval, so the cache must not make one either;
+        # other queries are embedded once, the retriever then reads it from the embedding cache
+        semantic = self.retriever.uses_vector_search(query)
+        if use_cache:
+            cached_answer, embedding = self.answer_cache.lookup(scope, self.transcript_hash, query, semantic=semantic)
+            if cached_answer is not None:
+                metrics.update({'cached': True, 'retrieval_s': 0.0,
+                                'time_to_first_token_s': time.perf_counter() - start,
+                                'total_s': time.perf_counter() - start})
+                logging.info(f"Chat reply metrics: {metrics}")
+                yield cached_answer
+                return
 
-        for word in reply.split():
-            
-            yield word + ' '
-            time.sleep(0.01)
+        documents = self.retriever.invoke(query)
+        context = "\n\n".join(document.page_content for document in documents)
+        prompt = self.qa_prompt.format(context=context, question=query)
+        retrieval_s = time.perf_counter() - start
+
+        time_to_first_token_s = None
+        tokens = []
+        for chunk in self.model.stream(prompt):
+            if chunk.content:
+                if time_to_first_token_s is None:
+                    time_to_first_token_s = time.perf_counter() - start
+                tokens.append(chunk.content)
+                yield chunk.content
+
+        if use_cache:
+            self.answer_cache.store(scope, self.transcript_hash, query, ''.join(tokens), embedding, semantic=semantic)
+        metrics.update({
+            'cached': False,
+            'retrieval_s': retrieval_s,
+            'time_to_first_token_s': time_to_first_token_s,
+            'total_s': time.perf_counter() - start,
+        })
+        logging.info(f"Chat reply metrics: {metrics}")
 
     # TODO:
     # debug the chat prompt window showing up at the -2 location instead of -1
     # - this is for sure again a re-running issue; it doesnt move after the reply comes in
     # because it cannot rerun fully (fragment rerun); might have to manually take care of it
-    def chat(self, episode_title):
+    def chat(self, episode_title, label="Chat with the episode:"):
         """
         Runs the chat interface using Streamlit.
+
+        :param episode_title: str
+            Title of the chatted episode; keys the message history and the input widget.
+        :param label: str, optional
+            Label of the chat input.
         """
         episode_title_friendly = '_'.join(episode_title.split())
         messages_key = f'messages_{episode_title_friendly}'
@@ -118,16 +278,20 @@ class ChatBotInterface:
                 st.markdown(message['content'])
 
         # Get user input
-        if prompt := st.chat_input("Chat with the episode:"):
+        if prompt := st.chat_input(label, key=f'chat_input_{episode_title_friendly}'):
             st.session_state[messages_key].append({"role": "user", "content": prompt})
             with st.chat_message("user"):
                 st.markdown(prompt)
 
             with st.chat_message("assistant"):    
             
-                reply = st.write_stream(self.reply_generator(prompt))
+                metrics = {}
+                reply = st.write_stream(self.reply_generator(prompt, scope=episode_title, metrics=metrics))
+                st.caption(f"{'Cached answer, ' if metrics['cached'] else ''}"
+                           f"first token after {metrics['time_to_first_token_s'] or metrics['total_s']:.2f}s, "
+                           f"done in {metrics['total_s']:.2f}s")
 
-            st.session_state[messages_key].append({"role": "assistant", "content": reply})
+            st.session_state[messages_key].append({"role": "assistant", "content": reply, "metrics": metrics})
 
 # if __name__ == "__main__":
 #     credentials_path = '../creds/openai_credentials.json'
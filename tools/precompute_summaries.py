@@ -0,0 +1,58 @@
+import argparse
+import feedparser
+import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tools.summary_creator import TranscriptSummarizer, SUMMARY_PROMPT_PATH
+from tools.supabase_client import SupabaseClient
+
+# Run from the repository root: python -m tools.precompute_summaries
+
+def find_missing_summaries(supabase: SupabaseClient, feed_url: str, version: str) -> list:
+    """Episodes in the feed that have a transcript but no summary for the given version."""
+    feed = feedparser.parse(feed_url)
+    titles = [entry.get('title', '').strip() for entry in feed.entries]
+    with_transcript = {title for title, status in supabase.get_availability().items() if status['transcript']}
+    summarized = supabase.list_summary_titles(version=version)
+    return [title for title in titles if title in with_transcript and title not in summarized]
+
+def precompute_summary(supabase: SupabaseClient, summarizer: TranscriptSummarizer, episode_title: str):
+    transcript = supabase.get_transcript(episode_title)
+    if not transcript:
+        raise ValueError("transcript disappeared")
+    summary = ''.join(summarizer.summarize_transcript(transcript))
+    metadata = {'episode_title': episode_title, 'summary_version': summarizer.version,
+                'model': summarizer.model, 'prompt_file': SUMMARY_PROMPT_PATH}
+    supabase.upload_summary(transcript_id=None, summary_text=summary, metadata=metadata)
+    return len(summary)
+
+def precompute_summaries(model: str = 'gpt-4o', max_workers: int = 3, limit: int = None, dry_run: bool = False):
+    supabase = SupabaseClient()
+    summarizer = TranscriptSummarizer(model=model, system_file_path=SUMMARY_PROMPT_PATH)
+    missing = find_missing_summaries(supabase, st.secrets["podcast"]["feed_url"], summarizer.version)
+    if limit:
+        missing = missing[:limit]
+
+    print(f"{len(missing)} episodes need a summary for version {summarizer.version}")
+    if dry_run:
+        for episode_title in missing:
+            print(f"Would summarize: {episode_title}")
+        return missing
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(precompute_summary, supabase, summarizer, title): title for title in missing}
+        for future in as_completed(futures):
+            try:
+                print(f"Summarized {futures[future]} ({future.result()} chars)")
+            except Exception as e:
+                print(f"Failed to summarize {futures[future]}: {str(e)}")
+    return missing
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate missing summaries for the current model and prompt.")
+    parser.add_argument('--model', default='gpt-4o')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="List the episodes without generating summaries")
+    args = parser.parse_args()
+
+    precompute_summaries(model=args.model, max_workers=args.workers, limit=args.limit, dry_run=args.dry_run)
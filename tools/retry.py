@@ -1,19 +1,259 @@
+import asyncio
+import inspect
+import logging
+import random
+import threading
 import time
+from collections import Counter, defaultdict
+from email.utils import parsedate_to_datetime
 from functools import wraps
 
-def retry(num_retries=3, sleep_between=1):
+# Statuses worth retrying: timeouts, throttling and transient server errors
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Transport errors of requests, httpx, openai and groq, matched by name so none of them has to be imported
+RETRYABLE_ERROR_NAMES = {'ConnectionError', 'Timeout', 'ReadTimeout', 'ConnectTimeout', 'TimeoutException',
+                         'TransportError', 'RemoteProtocolError', 'APIConnectionError', 'APITimeoutError',
+                         'ChunkedEncodingError'}
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, message, retry_in=0.0):
+        super().__init__(message)
+        # Seconds until the breaker lets a trial call through
+        self.retry_in = retry_in
+
+
+def status_code(exc):
+    """Return the HTTP status carried by an exception, if any."""
+    status = getattr(exc, 'status_code', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status
+
+
+def retry_after(exc):
+    """Return the delay requested by a ``Retry-After`` header on the exception's response, in seconds."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(exc):
+    """Whether the upstream is healthy but asked us to slow down (429 or a Retry-After)."""
+    return status_code(exc) == 429 or retry_after(exc) is not None
+
+
+def is_retryable(exc):
+    """The default policy: retry transport errors and transient HTTP statuses, nothing else."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker shared by every caller of one upstream.
+
+    After ``failure_threshold`` consecutive retryable failures the circuit opens and calls fail
+    fast with CircuitOpenError. Throttling responses are not failures: quota pressure is handled
+    by backing off, not by cutting the upstream off. Once ``reset_timeout_s`` has passed, a single trial call is let
+    through (half-open): its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout_s=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half_open' if time.monotonic() - self.opened_at >= self.reset_timeout_s else 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout_s - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.trial_running:
+                raise CircuitOpenError(f"Circuit for {self.name} is open", retry_in=max(remaining, 1.0))
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit for {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def record_neutral(self):
+        """A call ended with an error that says nothing about the upstream's health."""
+        with self.lock:
+            self.trial_running = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def get_breaker(upstream, **kwargs):
+    """Return the process-wide circuit breaker of an upstream, creating it on first use."""
+    with _breakers_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream, **kwargs)
+        return _breakers[upstream]
+
+
+def _count(upstream, key):
+    with _stats_lock:
+        _stats[upstream][key] += 1
+
+
+def get_retry_stats():
+    """Return {upstream: {'calls', 'attempts', 'retries', 'successes', 'give_ups', 'short_circuits'}}."""
+    with _stats_lock:
+        return {upstream: dict(counter) for upstream, counter in _stats.items()}
+
+
+def retry(num_retries=3, sleep_between=1, max_sleep=60, jitter=True, retry_on=None, upstream=None,
+          failure_threshold=5, reset_timeout_s=30):
+    """
+    Retry a function with exponential backoff.
+
+    Works for plain and ``async`` functions alike. The n-th retry waits up to
+    ``sleep_between * 2 ** (n - 1)`` seconds (capped at ``max_sleep``), randomised with full
+    jitter so that concurrent callers do not retry in lockstep; a ``Retry-After`` header on the
+    error's response takes precedence. With an ``upstream`` name, every call shares that
+    upstream's circuit breaker and is counted in ``get_retry_stats()``.
+
+    :param num_retries: Total number of attempts.
+    :param sleep_between: Base delay in seconds.
+    :param max_sleep: Upper bound of a single delay in seconds.
+    :param jitter: Randomise delays between zero and the backoff.
+    :param retry_on: Which errors to retry: a tuple of exception types or a predicate taking the
+        exception. Defaults to ``is_retryable``. Other errors are raised immediately.
+    :param upstream: Name of the upstream (e.g. 'openai') for the circuit breaker and counters.
+    :param failure_threshold: Consecutive failures that open the upstream's circuit.
+    :param reset_timeout_s: How long the circuit stays open before a trial call.
+    """
+    if retry_on is None:
+        should_retry = is_retryable
+    elif isinstance(retry_on, (type, tuple)):
+        should_retry = lambda exc: isinstance(exc, retry_on)
+    else:
+        should_retry = retry_on
+    stats_key = upstream or 'default'
+
+    def delay_for(attempt, exc):
+        requested = retry_after(exc)
+        if requested is not None:
+            return min(requested, max_sleep)
+        backoff = min(max_sleep, sleep_between * 2 ** (attempt - 1))
+        return random.uniform(0, backoff) if jitter else backoff
+
     def decorator(func):
+        breaker = get_breaker(upstream, failure_threshold=failure_threshold,
+                              reset_timeout_s=reset_timeout_s) if upstream else None
+
+        def before_attempt():
+            _count(stats_key, 'attempts')
+            if breaker is not None:
+                try:
+                    breaker.before_call()
+                except CircuitOpenError:
+                    _count(stats_key, 'short_circuits')
+                    raise
+
+        def after_failure(attempt, exc):
+            """Return the delay before the next attempt, or None to give up."""
+            retryable = should_retry(exc)
+            if breaker is not None and is_retryable(exc) and not is_throttled(exc):
+                breaker.record_failure()
+            elif breaker is not None:
+                breaker.record_neutral()
+            if not retryable or attempt >= num_retries:
+                _count(stats_key, 'give_ups')
+                logger.error(f"{func.__qualname__} failed after {attempt} attempt(s): {exc}")
+                return None
+            delay = delay_for(attempt, exc)
+            _count(stats_key, 'retries')
+            logger.warning(f"{func.__qualname__} attempt {attempt}/{num_retries} failed ({exc}); "
+                           f"retrying in {delay:.1f}s")
+            return delay
+
+        def after_success():
+            _count(stats_key, 'successes')
+            if breaker is not None:
+                breaker.record_success()
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                _count(stats_key, 'calls')
+                for attempt in range(1, num_retries + 1):
+                    before_attempt()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as exc:
+                        delay = after_failure(attempt, exc)
+                        if delay is None:
+                            raise
+                        await asyncio.sleep(delay)
+                    else:
+                        after_success()
+                        return result
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < num_retries:
+            _count(stats_key, 'calls')
+            for attempt in range(1, num_retries + 1):
+                before_attempt()
                 try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if attempts == num_retries:
+                    result = func(*args, **kwargs)
+                except Exception as exc:
+                    delay = after_failure(attempt, exc)
+                    if delay is None:
                         raise
-                    time.sleep(sleep_between)
-                    print(f"Retrying... Attempt {attempts + 1}/{num_retries}")
+                    time.sleep(delay)
+                else:
+                    after_success()
+                    return result
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+
+class Flight:
+    """One in-progress streamed generation that any number of subscribers can follow."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def append(self, part):
+        with self.condition:
+            self.parts.append(part)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def text(self):
+        with self.condition:
+            return ''.join(self.parts)
+
+    def subscribe(self):
+        """Yield everything produced so far, then every new part until the generation ends."""
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.parts) and not self.done:
+                    self.condition.wait()
+                new_parts = self.parts[index:]
+                index = len(self.parts)
+                done, error = self.done, self.error
+            yield from new_parts
+            if done and index == len(self.parts):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent streamed generations of the same key into a single one.
+
+    The first caller for a key starts the generation in a background thread; every caller,
+    including the first, gets a generator that replays what has been produced so far and then
+    follows the live stream. Because the generation is not tied to the caller, a dropped session
+    does not abort it, and ``on_complete`` (e.g. storing the result) runs exactly once per
+    generation. The partial output is checkpointed to disk every ``checkpoint_interval_s``
+    seconds; if the process dies mid-stream, the next generation of that key is handed the
+    checkpointed text so it can continue from there instead of starting over. A finished output
+    is checkpointed as complete, so if ``on_complete`` fails the next request replays it and only
+    retries ``on_complete``.
+    """
+
+    def __init__(self, checkpoint_dir='./cache/stream_checkpoints', checkpoint_interval_s=2.0):
+        """
+        Initializes the coordinator.
+
+        :param checkpoint_dir: str, optional
+            Directory for the partial-output checkpoints.
+        :param checkpoint_interval_s: float, optional
+            Minimum time between two checkpoints of the same generation.
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval_s = checkpoint_interval_s
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def stream(self, key, generate, on_complete=None):
+        """
+        Streams the generation for ``key``, starting it only if none is in progress.
+
+        :param key: str
+            Identifies the generation, e.g. the summary version and episode title.
+        :param generate: Callable[[Optional[str]], Iterable[str]]
+            Produces the stream; it receives the checkpointed partial output (or None) and must
+            yield only the text that follows it.
+        :param on_complete: Callable[[str], None], optional
+            Called once with the full text when the generation finishes.
+        :return: Generator[str]
+            The full output, replayed from the start.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = Flight()
+                self.flights[key] = flight
+                threading.Thread(target=self._run, args=(key, flight, generate, on_complete),
+                                 daemon=True, name='single-flight').start()
+        return flight.subscribe()
+
+    def in_progress(self, key):
+        with self.lock:
+            return key in self.flights
+
+    def _run(self, key, flight, generate, on_complete):
+        error = None
+        complete = False
+        try:
+            partial, complete = self._load_checkpoint(key)
+            if complete:
+                # Generated before, only storing it failed: replay it and retry the store
+                self.logger.info(f"Storing the already generated {key} again")
+                flight.append(partial)
+            else:
+                if partial:
+                    self.logger.info(f"Resuming {key} from a {len(partial)} character checkpoint")
+                    flight.append(partial)
+                last_checkpoint = time.time()
+                for part in generate(partial):
+                    flight.append(part)
+                    if time.time() - last_checkpoint >= self.checkpoint_interval_s:
+                        self._save_checkpoint(key, flight.text())
+                        last_checkpoint = time.time()
+                self._save_checkpoint(key, flight.text(), complete=True)
+                complete = True
+            if on_complete is not None:
+                on_complete(flight.text())
+            self._remove_checkpoint(key)
+        except Exception as e:
+            self.logger.error(f"Generation of {key} failed: {e}")
+            error = e
+            if not complete:
+                try:
+                    self._save_checkpoint(key, flight.text())
+                except OSError:
+                    pass
+        # Unregister before waking subscribers, so a retry starts a new flight instead of
+        # replaying this one's error
+        with self.lock:
+            self.flights.pop(key, None)
+        flight.finish(error)
+
+    def _checkpoint_path(self, key):
+        return os.path.join(self.checkpoint_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_checkpoint(self, key):
+        try:
+            with open(self._checkpoint_path(key), 'r', encoding='utf-8') as file:
+                checkpoint = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None, False
+        if checkpoint.get('key') != key:
+            return None, False
+        return checkpoint.get('text'), bool(checkpoint.get('complete'))
+
+    def _save_checkpoint(self, key, text, complete=False):
+        if not text:
+            return
+        path = self._checkpoint_path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'key': key, 'text': text, 'complete': complete, 'updated_at': time.time()}, file)
+        os.replace(tmp_path, path)
+
+    def _remove_checkpoint(self, key):
+        try:
+            os.remove(self._checkpoint_path(key))
+        except FileNotFoundError:
+            pass
@@ -1,23 +1,59 @@
+import re
+import hashlib
 import streamlit as st
+import tiktoken
 from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from tools.transcript_compactor import TranscriptCompactor
+from tools.retry import retry
 import json
 
+MAP_PROMPT = """You are given one part of a longer podcast transcript. Extract everything from this part that a final summary could need: the main ideas, insights, facts, numbers, recommendations, references and the most memorable quotes (copied exactly, with the speaker if it can be inferred). Write concise bullet points in the order they appear. Do not add an introduction or conclusion."""
+
+SUMMARY_PROMPT_PATH = './tools/prompts/extrac_widom_refined_claude.md'
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
 # TODO:
 # - rename the 'system_content' and everything related to something more descriptive,
 # like 'pattern' or whatever
 class TranscriptSummarizer:
     """Summarizes podcast transcripts using the OpenAI API."""
 
-    def __init__(self, model="gpt-4o", system_file_path="system.md"):
+    def __init__(self, model="gpt-4o", system_file_path="system.md", mode="auto", chunk_tokens=6000,
+                 single_pass_tokens=12000, max_workers=4, compaction="standard", system_content=None):
         """Initialize the summarizer with the specified model, system file, and credentials file.
 
         Args:
             model (str): The model to use for the OpenAI API.
             system_file_path (str): The path to the system context file.
+            mode (str): "single" sends the whole transcript in one call, "map_reduce" summarizes
+                chunks concurrently and then reduces them, "auto" picks map-reduce for long transcripts.
+            chunk_tokens (int): The maximum number of tokens per map chunk.
+            single_pass_tokens (int): In "auto" mode, transcripts longer than this use map-reduce.
+            max_workers (int): The number of chunks summarized concurrently.
+            compaction (str): How the transcript is compacted before it is sent: "standard" only
+                drops hesitations and repeated sentences, so quotes stay exact; "aggressive" also
+                strips fillers and backchannels; "off" keeps it verbatim. Long transcripts are
+                handled by map-reduce, not by lossier compaction.
+            system_content (str): A system prompt to use instead of reading ``system_file_path``,
+                e.g. a category prompt from ``episode_classifier.route_prompt``.
         """
         self.model = model
-        self.system_content = self._load_system_content(system_file_path)
-        self.client = OpenAI(api_key=st.secrets["openai"]["api_key"])
+        self.system_content = system_content or self._load_system_content(system_file_path)
+        # Retries are handled by tools.retry, which shares a circuit breaker across all OpenAI calls
+        self.client = OpenAI(api_key=st.secrets["openai"]["api_key"], max_retries=0)
+        self.mode = mode
+        self.chunk_tokens = chunk_tokens
+        self.single_pass_tokens = single_pass_tokens
+        self.max_workers = max_workers
+        # Identifies summaries produced by this (model, pattern) pair; editing the pattern changes it
+        self.version = f"{model}:{hashlib.sha256(self.system_content.encode('utf-8')).hexdigest()[:16]}"
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.compactor = TranscriptCompactor(model=model, mode=compaction)
 
     def _load_system_content(self, file_path):
         """Load the system context from a markdown file.
@@ -31,31 +67,118 @@ class TranscriptSummarizer:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
 
-    def summarize_transcript(self, transcript):
+    def count_tokens(self, text):
+        """Count the tokens of a text for the summarizer's model.
+
+        Args:
+            text (str): The text to count.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return len(self.encoding.encode(text))
+
+    def split_transcript(self, transcript):
+        """Split a transcript on sentence boundaries into chunks of at most ``chunk_tokens`` tokens.
+
+        Args:
+            transcript (str): The transcript text.
+
+        Returns:
+            list: The transcript chunks.
+        """
+        chunks = []
+        current = []
+        current_tokens = 0
+        sentences = []
+        for sentence in SENTENCE_BOUNDARY.split(transcript):
+            tokens = self.encoding.encode(sentence)
+            # unpunctuated ASR output can produce "sentences" longer than a chunk
+            for start in range(0, len(tokens), self.chunk_tokens):
+                sentences.append(self.encoding.decode(tokens[start:start + self.chunk_tokens]))
+
+        for sentence in sentences:
+            sentence_tokens = self.count_tokens(sentence) + 1
+            if current and current_tokens + sentence_tokens > self.chunk_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += sentence_tokens
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    @retry(num_retries=4, sleep_between=2, upstream='openai')
+    def _summarize_chunk(self, chunk):
+        """Extract the notes of a single transcript chunk (the map step).
+
+        Args:
+            chunk (str): The transcript chunk.
+
+        Returns:
+            str: The extracted notes.
+        """
+        response = self.client.chat.completions.create(model=self.model,
+        messages=[{"role": "system", "content": MAP_PROMPT}, {"role": "user", "content": chunk}],
+        temperature=0.0,
+        top_p=1
+        )
+        return response.choices[0].message.content
+
+    @retry(num_retries=4, sleep_between=2, upstream='openai')
+    def _create_stream(self, messages):
+        """Open the streamed completion of the final summary; only opening the stream is retried."""
+        return self.client.chat.completions.create(model=self.model,
+        messages=messages,
+        temperature=0.0,
+        top_p=1,
+        frequency_penalty=0.1,
+        presence_penalty=0.1,
+        stream=True
+        )
+
+    def summarize_transcript(self, transcript, resume_from=None):
         """Summarize the provided transcript using the OpenAI API.
 
+        The transcript is compacted first (see ``TranscriptCompactor``); the savings are logged.
+        Long transcripts (or every transcript in "map_reduce" mode) are split on sentence
+        boundaries, the chunks are summarized concurrently, and the final summary is streamed
+        from a reduce pass over the chunk notes with the same pattern file. Wall-clock time
+        then depends on the chunk size rather than on the length of the episode.
+
         Args:
             transcript (str): The transcript text to summarize.
+            resume_from (str): A partially generated summary (e.g. from an interrupted stream);
+                the model is asked to continue it, and only the continuation is streamed.
 
         Returns:
             Generator: A generator that streams the response from the API.
         """
+        transcript = self.compactor.compact(transcript).text
+        use_map_reduce = self.mode == "map_reduce" or (
+            self.mode == "auto" and self.count_tokens(transcript) > self.single_pass_tokens
+        )
+        if use_map_reduce:
+            chunks = self.split_transcript(transcript)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                notes = list(executor.map(self._summarize_chunk, chunks))
+            transcript = "\n\n".join(
+                f"NOTES FROM PART {i + 1} OF {len(notes)}:\n{part}" for i, part in enumerate(notes)
+            )
+
         system_message = {"role": "system", "content": self.system_content}
         user_message = {"role": "user", "content": transcript}
         messages = [system_message, user_message]
+        if resume_from:
+            messages += [{"role": "assistant", "content": resume_from},
+                         {"role": "user", "content": "Your previous answer was cut off. Continue it exactly where it stops, without repeating anything."}]
 
 
         try:
-            response_stream = self.client.chat.completions.create(model=self.model,
-            messages=messages,
-            temperature=0.0,
-            top_p=1,
-            frequency_penalty=0.1,
-            presence_penalty=0.1,
-            stream=True
-            )
+            response_stream = self._create_stream(messages)
         except Exception as e:
             st.error(e)
+            raise
 
         for chunk in response_stream:
             if chunk.choices[0].delta.content is not None:
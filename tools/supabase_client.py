@@ -1,37 +1,244 @@
 from supabase import create_client
+from collections import OrderedDict
+import base64
+import gzip
+import logging
+import threading
+import time
 import streamlit as st
 
+try:
+    from tools.retry import retry, is_retryable, status_code
+except ImportError:  # run as a script from tools/
+    from retry import retry, is_retryable, status_code
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compressed content is stored as "<marker><codec>:<base64 payload>"; anything else is plain text
+CONTENT_MARKER = 'ekz1:'
+
+def encode_content(text: str, compression: str = None) -> str:
+    """Encode text for storage, compressed with 'gzip' or 'zstd' (None stores it as-is)."""
+    if not compression:
+        return text
+    raw = text.encode('utf-8')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package")
+        payload = zstandard.ZstdCompressor(level=10).compress(raw)
+    elif compression == 'gzip':
+        payload = gzip.compress(raw, compresslevel=9)
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+    return f"{CONTENT_MARKER}{compression}:{base64.b64encode(payload).decode('ascii')}"
+
+def decode_content(content):
+    """Decode stored content; plain (legacy) rows are returned unchanged."""
+    if not content or not content.startswith(CONTENT_MARKER):
+        return content
+    compression, payload = content[len(CONTENT_MARKER):].split(':', 1)
+    raw = base64.b64decode(payload)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("Reading zstd content requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(raw).decode('utf-8')
+    if compression == 'gzip':
+        return gzip.decompress(raw).decode('utf-8')
+    raise ValueError(f"Unknown compression: {compression}")
+
+def is_encoded(content) -> bool:
+    return bool(content) and content.startswith(CONTENT_MARKER)
+
+def _insert_rejected(exc) -> bool:
+    # Inserts are not idempotent: only retry when the request was refused, never after a timeout
+    return status_code(exc) in (429, 503)
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries expire after ``ttl_s`` seconds."""
+
+    def __init__(self, max_entries=256, ttl_s=600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_s:
+                self.entries.pop(key, None)
+                return default
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+# Shared by every SupabaseClient in the process
+_content_cache = TTLCache(max_entries=256, ttl_s=600)
+_MISSING = object()
+
 class SupabaseClient:
-    def __init__(self):
+    def __init__(self, compression: str = None):
         self.url = st.secrets["supabase"]["url"]
         self.key = st.secrets["supabase"]["key"]
         self.client = create_client(self.url, self.key)
+        # Compression for new uploads ('gzip' or 'zstd'); reads always handle every format
+        self.compression = compression or st.secrets["supabase"].get("compression")
+        self.cache = _content_cache
+        # Switched off when the episode_title column (migrations/001) is not there yet
+        self.use_episode_column = True
 
+    @retry(upstream='supabase')
+    def _select_by_episode(self, table: str, columns: str, episode_title: str, filters: dict = None):
+        # Latest row first, so episodes with duplicate rows resolve to the one the catalog indexes
+        filters = filters or {}
+        if self.use_episode_column:
+            try:
+                query = self.client.table(table).select(columns).eq('episode_title', episode_title)
+                for column, value in filters.items():
+                    query = query.eq(column, value)
+                return query.order('id', desc=True).execute().data
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                logging.warning(f"Falling back to metadata lookups, episode_title column unavailable: {e}")
+                self.use_episode_column = False
+        query = self.client.table(table).select(columns).eq('metadata->>episode_title', episode_title)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query.order('id', desc=True).execute().data
+
+    def _get_content(self, table: str, episode_title: str, filters: dict = None):
+        key = (table, episode_title, tuple(sorted((filters or {}).items())))
+        content = self.cache.get(key, _MISSING)
+        if content is _MISSING:
+            rows = self._select_by_episode(table, 'content', episode_title, filters)
+            content = decode_content(rows[0]['content']) if rows else None
+            # Misses are not cached: other processes (transcriber, precompute job, uploader) may
+            # add the row at any moment, and this process would not see it until the TTL expired
+            if content is not None:
+                self.cache.set(key, content)
+        return content
+
+    @retry(upstream='supabase')
+    def get_availability(self):
+        """Return {episode_title: {'transcript': bool, 'summary': bool}} for every stored episode."""
+        availability = self.cache.get('availability')
+        if availability is not None:
+            return availability
+        try:
+            rows = self.client.rpc('episode_availability').execute().data
+            availability = {row['episode_title']: {'transcript': row['has_transcript'], 'summary': row['has_summary']}
+                            for row in rows}
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            logging.warning(f"episode_availability unavailable, listing tables instead: {e}")
+            transcripts = self.client.table('transcripts').select('metadata->>episode_title').execute().data
+            summaries = self.client.table('summaries').select('metadata->>episode_title').execute().data
+            transcript_titles = {row['episode_title'] for row in transcripts}
+            summary_titles = {row['episode_title'] for row in summaries}
+            availability = {title: {'transcript': title in transcript_titles, 'summary': title in summary_titles}
+                            for title in transcript_titles | summary_titles if title}
+        self.cache.set('availability', availability)
+        return availability
+
+    @retry(upstream='supabase', retry_on=_insert_rejected)
     def upload_transcript(self, episode_title: str, transcript_text: str, metadata: dict):
         data = {
-            'content': transcript_text,
+            'content': encode_content(transcript_text, self.compression),
+            'metadata': metadata
+        }
+        response = self.client.table('transcripts').insert(data).execute()
+        self.cache.invalidate(('transcripts', metadata.get('episode_title', episode_title), ()))
+        self.cache.invalidate('availability')
+        return response
+
+    @retry(upstream='supabase', retry_on=_insert_rejected)
+    def upload_transcripts(self, transcripts: list):
+        """Insert many (transcript_text, metadata) pairs in a single request."""
+        data = [{'content': encode_content(text, self.compression), 'metadata': metadata}
+                for text, metadata in transcripts]
+        response = self.client.table('transcripts').insert(data).execute()
+        for _, metadata in transcripts:
+            self.cache.invalidate(('transcripts', metadata.get('episode_title'), ()))
+        self.cache.invalidate('availability')
+        return response
+
+    @retry(upstream='supabase')
+    def update_transcript(self, transcript_id, transcript_text: str, metadata: dict):
+        data = {
+            'content': encode_content(transcript_text, self.compression),
             'metadata': metadata
         }
-        return self.client.table('transcripts').insert(data).execute()
+        response = self.client.table('transcripts').update(data).eq('id', transcript_id).execute()
+        self.cache.invalidate(('transcripts', metadata.get('episode_title'), ()))
+        self.cache.invalidate('availability')
+        return response
 
     def get_transcript(self, episode_title: str):
+        return self._get_content('transcripts', episode_title)
+
+    @retry(upstream='supabase')
+    def list_transcripts(self, page_size: int = 1000):
+        # PostgREST caps responses (1000 rows by default), so page through by id
+        rows = []
+        while True:
+            response = self.client.table('transcripts')\
+                .select('id, metadata')\
+                .order('id')\
+                .range(len(rows), len(rows) + page_size - 1)\
+                .execute()
+            rows.extend(response.data)
+            if len(response.data) < page_size:
+                return rows
+
+    @retry(upstream='supabase')
+    def get_transcripts_by_ids(self, transcript_ids: list):
         response = self.client.table('transcripts')\
-            .select('content')\
-            .eq('metadata->>episode_title', episode_title)\
+            .select('id, content, metadata')\
+            .in_('id', transcript_ids)\
             .execute()
-        return response.data[0]['content'] if response.data else None
+        return [dict(row, content=decode_content(row['content'])) for row in response.data]
 
+    @retry(upstream='supabase', retry_on=_insert_rejected)
     def upload_summary(self, transcript_id: str, summary_text: str, metadata: dict):
         data = {
             'transcript_id': transcript_id,
-            'content': summary_text,
+            'content': encode_content(summary_text, self.compression),
             'metadata': metadata
         }
-        return self.client.table('summaries').insert(data).execute()
+        response = self.client.table('summaries').insert(data).execute()
+        self.cache.invalidate(('summaries', metadata.get('episode_title'), ()))
+        if metadata.get('summary_version'):
+            version_filter = (('metadata->>summary_version', metadata['summary_version']),)
+            self.cache.invalidate(('summaries', metadata.get('episode_title'), version_filter))
+        self.cache.invalidate('availability')
+        return response
 
-    def get_summary(self, episode_title: str):
-        response = self.client.table('summaries')\
-            .select('content')\
-            .eq('metadata->>episode_title', episode_title)\
-            .execute()
-        return response.data[0]['content'] if response.data else None
\ No newline at end of file
+    def get_summary(self, episode_title: str, version: str = None):
+        # With a version, only summaries generated by that (model, prompt) pair are returned
+        filters = {'metadata->>summary_version': version} if version else None
+        return self._get_content('summaries', episode_title, filters)
+
+    @retry(upstream='supabase')
+    def list_summary_titles(self, version: str = None):
+        query = self.client.table('summaries').select('metadata->>episode_title')
+        if version:
+            query = query.eq('metadata->>summary_version', version)
+        return {row['episode_title'] for row in query.execute().data}
\ No newline at end of file
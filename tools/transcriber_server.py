@@ -1,11 +1,21 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 from pyngrok import ngrok
 import uvicorn
 from audio_transcriber import EpisodeTranscriber
 from episode_downloader import EpisodeDownloader
+from transcript_cache import TranscriptCache
 from pydantic import BaseModel
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
+import os
+import threading
+import time
+import uuid
 
 # TODO:
 # figure out why logging isnt flushed to a file
@@ -20,7 +30,48 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 console_handler.setFormatter(formatter)
 logging.getLogger().addHandler(console_handler)
 
-app = FastAPI()
+# Job queue configuration
+NUM_WORKERS = int(os.environ.get("TRANSCRIBER_WORKERS", 2))
+MAX_QUEUED_JOBS = int(os.environ.get("TRANSCRIBER_MAX_QUEUED_JOBS", 32))
+MAX_FINISHED_JOBS = 1000
+
+job_queue = None
+model_loading = None
+transcriber = None
+jobs = OrderedDict()
+# downloads and uploads of different jobs overlap, but only one job runs inference at a time
+inference_lock = threading.Lock()
+
+SERVER_START = time.time()
+
+def load_transcriber():
+    """Build the EpisodeTranscriber. Blocking; runs in a background thread during startup."""
+    global transcriber
+    start_time = time.time()
+    cpu_threads = os.environ.get("TRANSCRIBER_CPU_THREADS")
+    transcriber = EpisodeTranscriber(device=os.environ.get("TRANSCRIBER_DEVICE", "auto"),
+                                     cpu_threads=int(cpu_threads) if cpu_threads else None,
+                                     model_cache_dir=os.environ.get("TRANSCRIBER_MODEL_CACHE", "./model_cache"))
+    logging.info(f"Startup: model loaded in {time.time() - start_time:.2f}s "
+                 f"({time.time() - SERVER_START:.2f}s after process start), phases: {transcriber.startup_timings}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the job workers and the background model load with the server, and stop them on shutdown.
+
+    The port opens immediately; jobs submitted before the model is ready wait in the queue.
+    """
+    global job_queue, model_loading
+    job_queue = asyncio.Queue(maxsize=MAX_QUEUED_JOBS)
+    model_loading = asyncio.create_task(asyncio.to_thread(load_transcriber))
+    workers = [asyncio.create_task(job_worker(i)) for i in range(NUM_WORKERS)]
+    logging.info(f"Started {NUM_WORKERS} transcription workers")
+    logging.info(f"Startup: serving after {time.time() - SERVER_START:.2f}s, model loading in background")
+    yield
+    for worker in workers:
+        worker.cancel()
+
+app = FastAPI(lifespan=lifespan)
 security = HTTPBearer()
 
 class TranscriptionRequest(BaseModel):
@@ -42,32 +93,288 @@ def verify_token(credentials: HTTPBearer = Depends(security)):
         raise HTTPException(status_code=403, detail="Invalid authentication token")
     return credentials.credentials
 
-@app.post("/transcribe")
+def run_transcription(request: TranscriptionRequest):
+    """Download, transcribe and upload an episode. Blocking; runs in a worker thread.
+
+    Episodes that were already transcribed with the current model are answered from the
+    transcript cache without downloading the audio again.
+
+    :param request: Transcription request details including the URL, title, and podcast name
+    :type request: TranscriptionRequest
+    :raises RuntimeError: If the episode could not be downloaded
+    :return: Path where the transcription file is stored
+    :rtype: str
+    """
+    cache_key = transcript_cache.episode_key(request.episode_url, transcriber.model_id, session=downloader.session)
+    cached = transcript_cache.get(cache_key)
+    if cached is not None and cached['metadata'].get('upload_path'):
+        logging.info(f"Transcript cache hit for: {request.episode_title}")
+        return cached['metadata']['upload_path']
+
+    local_file_path = downloader.download_single_episode(request.episode_url, request.episode_title, request.podcast_title)
+    if local_file_path is None:
+        raise RuntimeError(f"Failed to download episode: {request.episode_title}")
+    logging.info(f"Downloaded audio file to: {local_file_path}")
+    with inference_lock:
+        transcription_path = transcriber.transcribe(local_file_path)
+    logging.info(f"Transcribed audio to: {transcription_path}")
+    upload_path = transcriber.upload(transcription_path)
+    logging.info(f"Uploaded transcription to: {upload_path}")
+    with open(transcription_path, 'r', encoding='utf-8') as file:
+        transcript_cache.put(cache_key, file.read(), {'episode_title': request.episode_title,
+                                                      'podcast_title': request.podcast_title,
+                                                      'upload_path': upload_path})
+    return upload_path
+
+def stream_transcription(request: TranscriptionRequest):
+    """Download and transcribe an episode, yielding transcript segments as they finish. Blocking.
+
+    Once all segments are out, the transcript is saved, uploaded and cached like in
+    :func:`run_transcription`, and a final ``done`` event carries the upload path.
+
+    :param request: Transcription request details including the URL, title, and podcast name
+    :type request: TranscriptionRequest
+    :raises RuntimeError: If the episode could not be downloaded
+    :return: Generator of ``(event, data)`` tuples
+    :rtype: Generator
+    """
+    cache_key = transcript_cache.episode_key(request.episode_url, transcriber.model_id, session=downloader.session)
+    cached = transcript_cache.get(cache_key)
+    if cached is not None and cached['metadata'].get('upload_path'):
+        logging.info(f"Transcript cache hit for: {request.episode_title}")
+        yield "segment", {"index": 0, "start_s": 0.0, "end_s": None, "text": cached['text']}
+        yield "done", {"transcription_file_path": cached['metadata']['upload_path']}
+        return
+
+    local_file_path = downloader.download_single_episode(request.episode_url, request.episode_title, request.podcast_title)
+    if local_file_path is None:
+        raise RuntimeError(f"Failed to download episode: {request.episode_title}")
+    logging.info(f"Downloaded audio file to: {local_file_path}")
+    texts = []
+    with inference_lock:
+        for segment in transcriber.transcribe_stream(local_file_path):
+            texts.append(segment["text"])
+            yield "segment", segment
+    transcription_path = transcriber.save({"text": " ".join(texts)}, local_file_path)
+    logging.info(f"Transcribed audio to: {transcription_path}")
+    upload_path = transcriber.upload(transcription_path)
+    logging.info(f"Uploaded transcription to: {upload_path}")
+    transcript_cache.put(cache_key, " ".join(texts), {'episode_title': request.episode_title,
+                                                      'podcast_title': request.podcast_title,
+                                                      'upload_path': upload_path})
+    yield "done", {"transcription_file_path": upload_path}
+
+async def _iterate_in_thread(generator_fn, *args):
+    """Run a blocking generator in a worker thread and yield its items on the event loop.
+
+    :param generator_fn: Function returning the blocking generator
+    :type generator_fn: Callable
+    :return: Async generator of the generator's items
+    :rtype: AsyncGenerator
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    end = object()
+
+    def produce():
+        try:
+            for item in generator_fn(*args):
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(items.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, end)
+
+    producer = asyncio.create_task(asyncio.to_thread(produce))
+    while True:
+        item = await items.get()
+        if item is end:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    await producer
+
+async def job_worker(worker_id: int):
+    """Take jobs off the queue and run them off the event loop.
+
+    Streaming jobs carry an ``events`` queue; their ``(event, data)`` tuples are forwarded to it
+    as they are produced, followed by ``None`` once the job has finished.
+
+    :param worker_id: Index of the worker, used in log messages
+    :type worker_id: int
+    """
+    while True:
+        job_id = await job_queue.get()
+        job = jobs[job_id]
+        try:
+            await asyncio.shield(model_loading)
+            job.update(status="running", started_at=time.time())
+            logging.info(f"Worker {worker_id} started job {job_id}")
+            if "events" in job:
+                result = None
+                async for event, data in _iterate_in_thread(stream_transcription, job["request"]):
+                    job["events"].put_nowait((event, data))
+                    if event == "done":
+                        result = data
+                job.update(status="completed", result=result)
+            else:
+                upload_path = await asyncio.to_thread(run_transcription, job["request"])
+                job.update(status="completed", result={"transcription_file_path": upload_path})
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed")
+            job.update(status="failed", error=str(e))
+            if "events" in job:
+                job["events"].put_nowait(("error", {"error": str(e)}))
+        finally:
+            job["finished_at"] = time.time()
+            if "events" in job:
+                job.pop("events").put_nowait(None)
+            job_queue.task_done()
+
+def _submit_job(request: TranscriptionRequest, **extra):
+    """Register a job and put it on the queue.
+
+    :param request: Transcription request details including the URL, title, and podcast name
+    :type request: TranscriptionRequest
+    :raises HTTPException: If the job queue is full
+    :return: The id of the queued job
+    :rtype: str
+    """
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = {"status": "queued", "request": request, "submitted_at": time.time(), **extra}
+    try:
+        job_queue.put_nowait(job_id)
+    except asyncio.QueueFull:
+        del jobs[job_id]
+        raise HTTPException(status_code=503, detail="Transcription queue is full, retry later")
+    _prune_jobs()
+    return job_id
+
+def _prune_jobs():
+    """Drop the oldest finished jobs so the job table does not grow without bound."""
+    finished = [job_id for job_id, job in jobs.items() if job["status"] in ("completed", "failed")]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del jobs[job_id]
+
+def _job_view(job_id: str, job: dict):
+    """Serialise a job for API responses.
+
+    :param job_id: The job id
+    :type job_id: str
+    :param job: The job record
+    :type job: dict
+    :return: The public fields of the job
+    :rtype: dict
+    """
+    view = {"job_id": job_id, "status": job["status"], "submitted_at": job["submitted_at"]}
+    for key in ("started_at", "finished_at", "result", "error"):
+        if key in job:
+            view[key] = job[key]
+    return view
+
+@app.post("/transcribe", status_code=202)
 async def transcribe_audio(request: TranscriptionRequest, token: str = Depends(verify_token)):
-    """Process transcription request by downloading, transcribing, and uploading the audio file.
+    """Queue a transcription job for the episode and return its id without waiting for it.
 
     :param request: Transcription request details including the URL, title, and podcast name
     :type request: TranscriptionRequest
     :param token: Authentication token, defaults to a token provided by security dependency
     :type token: str, optional
-    :return: Path where the transcription file is stored
+    :raises HTTPException: If the job queue is full
+    :return: The id and status of the queued job
     :rtype: dict
     """
 
     # Log the request payload
     logging.info(f"Received request to transcribe audio: {request.model_dump_json()}")
-    local_file_path = downloader.download_single_episode(request.episode_url, request.episode_title, request.podcast_title)    
-    logging.info(f"Downloaded audio file to: {local_file_path}")
-    transcription_path = transcriber.transcribe(local_file_path)
-    logging.info(f"Transcribed audio to: {transcription_path}")
-    upload_path = transcriber.upload(transcription_path)
-    logging.info(f"Uploaded transcription to: {upload_path}")
-    return {"transcription_file_path": upload_path}
+    job_id = _submit_job(request)
+    return _job_view(job_id, jobs[job_id])
+
+@app.post("/transcribe/stream")
+async def transcribe_audio_stream(request: TranscriptionRequest, token: str = Depends(verify_token)):
+    """Transcribe the episode and stream transcript segments as server-sent events.
+
+    The transcription is queued like ``/transcribe`` and runs on a job worker; a ``queued``
+    event carries the job id, which ``/jobs/{job_id}`` also reports. Each ``segment`` event carries the segment's ``index``, ``start_s``, ``end_s`` and ``text``
+    as soon as that part of the episode is transcribed; a final ``done`` event carries the
+    upload path, or an ``error`` event the failure.
+
+    :param request: Transcription request details including the URL, title, and podcast name
+    :type request: TranscriptionRequest
+    :param token: Authentication token, defaults to a token provided by security dependency
+    :type token: str, optional
+    :raises HTTPException: If the job queue is full
+    :return: A ``text/event-stream`` response
+    :rtype: StreamingResponse
+    """
+    logging.info(f"Received request to stream transcription: {request.model_dump_json()}")
+    events_queue = asyncio.Queue()
+    job_id = _submit_job(request, events=events_queue)
+
+    async def events():
+        yield f"event: queued\ndata: {json.dumps({'job_id': job_id})}\n\n"
+        while (item := await events_queue.get()) is not None:
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, token: str = Depends(verify_token)):
+    """Report the status of a transcription job, and its result once completed.
+
+    :param job_id: The id returned by ``/transcribe``
+    :type job_id: str
+    :param token: Authentication token, defaults to a token provided by security dependency
+    :type token: str, optional
+    :raises HTTPException: If the job is unknown
+    :return: The job status
+    :rtype: dict
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return _job_view(job_id, job)
+
+def _model_status():
+    """Report the state of the background model load.
+
+    :return: One of "loading", "ready" or "failed"
+    :rtype: str
+    """
+    if model_loading is None or not model_loading.done():
+        return "loading"
+    return "failed" if model_loading.exception() else "ready"
+
+@app.get("/health")
+async def health():
+    """Report liveness, model readiness and queue depth.
+
+    :return: Server status
+    :rtype: dict
+    """
+    running = sum(1 for job in jobs.values() if job["status"] == "running")
+    return {"status": "ok", "model": _model_status(), "workers": NUM_WORKERS,
+            "queued": job_queue.qsize() if job_queue else 0, "running": running}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: succeeds only once the model is loaded.
+
+    :raises HTTPException: If the model is still loading or failed to load
+    :return: Model status and startup timings
+    :rtype: dict
+    """
+    status = _model_status()
+    if status != "ready":
+        raise HTTPException(status_code=503, detail=f"Model {status}")
+    return {"model": status, "startup_timings": transcriber.startup_timings}
 
 if __name__ == "__main__":
     # Tunnel the FastAPI server on port 8000
     downloader = EpisodeDownloader('./audio')
-    transcriber = EpisodeTranscriber()
+    transcript_cache = TranscriptCache()
     public_url = ngrok.connect(8000, name='transcriber_server')
     # TODO:
     # upload the url into a config in lightning studio so it gets automatically picked up
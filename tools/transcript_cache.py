@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import requests
+
+
+class TranscriptCache:
+    """A content-addressed, size-bounded on-disk cache of episode transcripts.
+
+    Entries are keyed by the episode's identity (enclosure URL plus the ETag, Content-Length and
+    Last-Modified the host reports for it) and the model that produced the transcript, so a new
+    upload of the audio or a model change is a miss. When the cache grows beyond ``max_bytes``
+    the least recently used entries are evicted.
+
+    Attributes:
+        cache_dir (str): The directory holding the cache entries.
+        max_bytes (int): The size limit of the cache in bytes.
+    """
+    def __init__(self, cache_dir: str = './cache/transcripts', max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def episode_key(url, model_id, session=None, timeout=10):
+        """Build a cache key from the episode's enclosure URL without downloading the audio.
+
+        Args:
+            url (str): The URL of the episode's audio file.
+            model_id (str): The model that produces the transcript.
+            session (requests.Session, optional): The session used for the HEAD request.
+            timeout (int): Timeout of the HEAD request in seconds.
+
+        Returns:
+            str: The hex digest identifying the (episode, model) pair.
+        """
+        identity = {'url': url, 'model': model_id}
+        try:
+            response = (session or requests).head(url, allow_redirects=True, timeout=timeout)
+            if response.ok:
+                for header in ('ETag', 'Content-Length', 'Last-Modified'):
+                    if header in response.headers:
+                        identity[header.lower()] = response.headers[header]
+        except requests.RequestException as e:
+            logging.getLogger(__name__).warning(f"Could not fetch headers for {url}: {e}")
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def audio_key(audio_file, model_id, block_size=1024 * 1024):
+        """Build a cache key from the content of an already downloaded audio file.
+
+        Args:
+            audio_file (str): The path to the audio file.
+            model_id (str): The model that produces the transcript.
+            block_size (int): The number of bytes hashed per read.
+
+        Returns:
+            str: The hex digest identifying the (audio, model) pair.
+        """
+        digest = hashlib.sha256(model_id.encode('utf-8'))
+        with open(audio_file, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Look up a cache entry and mark it as recently used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: The entry with ``text`` and ``metadata``, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        os.utime(path)
+        return entry
+
+    def put(self, key, text, metadata=None):
+        """Store a transcript and evict old entries if the cache is over its size limit.
+
+        Args:
+            key (str): The cache key.
+            text (str): The transcript text.
+            metadata (dict, optional): Extra information stored alongside the transcript.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'text': text, 'metadata': metadata or {}}, file)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``."""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.logger.info(f"Evicted transcript cache entry {name}")
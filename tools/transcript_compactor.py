@@ -0,0 +1,180 @@
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+import tiktoken
+
+# Hesitations carry no content and are safe to drop everywhere
+DISFLUENCIES = re.compile(r"\b(?:u+m+|u+h+m*|e+r+m+|e+r|a+h+|h+m+|m+-?h+m+|mhm)\b[,.]?\s*", re.IGNORECASE)
+# Discourse fillers are usually, but not always, empty; only removed when over budget or in aggressive mode
+FILLERS = re.compile(r",?\s*\b(?:you know|I mean|like|basically|actually|literally|so to speak),\s*", re.IGNORECASE)
+BACKCHANNELS = {'yeah', 'yep', 'yes', 'right', 'exactly', 'okay', 'ok', 'sure', 'absolutely', 'totally',
+                'true', 'wow', 'interesting', 'mm', 'mhm', 'uh-huh', 'correct', 'definitely'}
+# Words that legitimately appear twice in a row ("had had", "that that", "is is")
+FUNCTION_WORDS = {'had', 'that', 'is', 'was', 'do', 'did', 'the', 'a', 'to', 'of', 'in', 'it', 'i', 'you',
+                  'we', 'they', 'he', 'she', 'and', 'but', 'or', 'so', 'no', 'not', 'be', 'have', 'has', 'who'}
+NUMERIC = re.compile(r"\d")
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([,.!?;:])")
+REPEATED_PUNCTUATION = re.compile(r"([,;:])(?:\s*[,;:])+")
+
+MODES = ('off', 'standard', 'aggressive')
+
+
+def _normalize(word):
+    return word.strip('.,!?;:"\'()').lower()
+
+
+@dataclass
+class CompactionResult:
+    """The compacted text and what the compaction saved."""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    stages: list = field(default_factory=list)
+
+    @property
+    def saved_tokens(self):
+        return self.tokens_before - self.tokens_after
+
+    @property
+    def saved_ratio(self):
+        return self.saved_tokens / self.tokens_before if self.tokens_before else 0.0
+
+    def report(self):
+        return (f"{self.tokens_before} -> {self.tokens_after} tokens "
+                f"({self.saved_ratio:.1%} saved; stages: {', '.join(self.stages) or 'none'})")
+
+
+class TranscriptCompactor:
+    """Shrinks raw ASR transcripts before they are sent to an LLM.
+
+    The standard stages only remove hesitations ("um", "uh") and drop sentences of at least
+    ``min_dedupe_words`` words repeated verbatim within the last few sentences, which is what
+    overlapping chunk boundaries produce; short replies like "Yes." are real dialogue and kept.
+    When a ``token_budget`` is set and the text is still over it, lossier stages follow, one at a
+    time until it fits: collapsing immediately repeated phrases ("we went to the we went to the";
+    numbers and doubled function words like "had had" are left alone), discourse fillers
+    ("you know,", "I mean,") and one-word backchannel sentences ("Yeah.", "Right."). The text is never truncated, so it can remain over budget. The
+    "aggressive" mode always runs every stage and "off" leaves the text untouched, e.g. when
+    quotes must be exact.
+
+    Attributes:
+        mode (str): "off", "standard" or "aggressive".
+        token_budget (int): The target size in tokens, or None.
+        max_ngram (int): The longest phrase, in words, collapsed when immediately repeated.
+        dedupe_window (int): How many previous sentences a sentence is compared against.
+        min_dedupe_words (int): The shortest sentence, in words, dropped as a repeat.
+    """
+    def __init__(self, model="gpt-4o", mode="standard", token_budget=None, max_ngram=8, dedupe_window=5,
+                 min_dedupe_words=6):
+        if mode not in MODES:
+            raise ValueError(f"Unknown compaction mode: {mode}")
+        self.mode = mode
+        self.token_budget = token_budget
+        self.max_ngram = max_ngram
+        self.dedupe_window = dedupe_window
+        self.min_dedupe_words = min_dedupe_words
+        self.logger = logging.getLogger(__name__)
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text))
+
+    def compact(self, text):
+        """Compact a transcript.
+
+        Args:
+            text (str): The raw transcript.
+
+        Returns:
+            CompactionResult: The compacted text with its token counts before and after.
+        """
+        tokens_before = self.count_tokens(text)
+        if self.mode == "off" or not text:
+            return CompactionResult(text, tokens_before, tokens_before)
+
+        stages = []
+        for name, stage in [("disfluencies", self._strip_disfluencies),
+                            ("overlaps", self._dedupe_sentences)]:
+            text = stage(text)
+            stages.append(name)
+
+        tokens_after = self.count_tokens(text)
+        for name, stage in [("repetitions", self._collapse_repetitions), ("fillers", self._strip_fillers),
+                            ("backchannels", self._drop_backchannels)]:
+            if self.mode != "aggressive" and (self.token_budget is None or tokens_after <= self.token_budget):
+                break
+            text = stage(text)
+            stages.append(name)
+            tokens_after = self.count_tokens(text)
+
+        result = CompactionResult(text, tokens_before, tokens_after, stages)
+        self.logger.info(f"Transcript compaction: {result.report()}")
+        return result
+
+    def _map_lines(self, text, transform):
+        return "\n".join(transform(line) for line in text.split("\n"))
+
+    def _tidy(self, line):
+        line = SPACE_BEFORE_PUNCTUATION.sub(r"\1", line)
+        line = REPEATED_PUNCTUATION.sub(r"\1", line)
+        return " ".join(line.split())
+
+    def _strip_disfluencies(self, text):
+        return self._map_lines(text, lambda line: self._tidy(DISFLUENCIES.sub("", line)))
+
+    def _strip_fillers(self, text):
+        return self._map_lines(text, lambda line: self._tidy(FILLERS.sub(" ", line)))
+
+    def _collapse_repetitions(self, text):
+        def collapse(line):
+            words = line.split()
+            keys = [_normalize(word) for word in words]
+            for n in range(self.max_ngram, 0, -1):
+                kept_words, kept_keys = [], []
+                i = 0
+                while i < len(words):
+                    # Skip this n-gram if it repeats the one just kept
+                    if len(kept_keys) >= n and keys[i:i + n] == kept_keys[-n:] and self._collapsible(keys[i:i + n]):
+                        i += n
+                        continue
+                    kept_words.append(words[i])
+                    kept_keys.append(keys[i])
+                    i += 1
+                words, keys = kept_words, kept_keys
+            return " ".join(words)
+        return self._map_lines(text, collapse)
+
+    def _collapsible(self, keys):
+        if not any(keys) or any(NUMERIC.search(key) for key in keys):
+            return False
+        return not (len(keys) == 1 and keys[0] in FUNCTION_WORDS)
+
+    def _dedupe_sentences(self, text):
+        recent = deque(maxlen=self.dedupe_window)
+
+        def dedupe(line):
+            kept = []
+            for sentence in SENTENCE_BOUNDARY.split(line):
+                words = sentence.split()
+                if len(words) < self.min_dedupe_words:
+                    kept.append(sentence)
+                    continue
+                key = " ".join(_normalize(word) for word in words)
+                if key in recent:
+                    continue
+                recent.append(key)
+                kept.append(sentence)
+            return " ".join(kept)
+        return self._map_lines(text, dedupe)
+
+    def _drop_backchannels(self, text):
+        def drop(line):
+            return " ".join(sentence for sentence in SENTENCE_BOUNDARY.split(line)
+                            if not (len(sentence.split()) <= 2
+                                    and all(_normalize(word) in BACKCHANNELS for word in sentence.split())))
+        return self._map_lines(text, drop)
@@ -1,50 +1,155 @@
 import os
 import json
+import argparse
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from supabase_client import SupabaseClient
 
-def upload_existing_transcripts():
-    supabase = SupabaseClient()
-    transcripts_dir = "/home/dd/ekko_docker/app/transcripts/"
-    
-    # Load podcast tracker
-    with open('/home/dd/ekko_docker/app/podcast_tracker.json', 'r') as f:
+TRANSCRIPTS_DIR = "/home/dd/ekko_docker/app/transcripts/"
+TRACKER_PATH = "/home/dd/ekko_docker/app/podcast_tracker.json"
+CHECKPOINT_PATH = "./upload_checkpoint.json"
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def load_checkpoint(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_local_transcripts(tracker_path: str, transcripts_dir: str) -> list:
+    """Read every transcript listed in the tracker; returns (episode_title, text, metadata) tuples."""
+    with open(tracker_path, 'r') as f:
         podcast_tracker = json.load(f)
-    
-    # Iterate through episodes in the tracker
+
+    transcripts = []
     for episode_title, episode_data in podcast_tracker.items():
-        transcript_path = episode_data['transcript']
-        transcript_filename = os.path.basename(transcript_path)
-        
-        # Construct full path to transcript
+        transcript_filename = os.path.basename(episode_data['transcript'])
         full_transcript_path = os.path.join(os.path.dirname(transcripts_dir), transcript_filename)
-        
         try:
             with open(full_transcript_path, 'r') as f:
                 transcript_text = f.read()
-            
-            # Prepare metadata
-            metadata = {
-                'episode_title': episode_title,
-                'mp3_url': episode_data['mp3_url'],
-                'date': episode_data['date'],
-                'duration': episode_data['duration'],
-                'processed_date': episode_data['processed_date']
-            }
-            
-            try:
-                supabase.upload_transcript(
-                    episode_title=episode_title,
-                    transcript_text=transcript_text,
-                    metadata=metadata
-                )
-                print(f"Uploaded transcript for {episode_title}")
-            except Exception as e:
-                print(f"Failed to upload {episode_title}: {str(e)}")
-                
         except FileNotFoundError:
             print(f"Warning: Transcript file not found for {episode_title} at {full_transcript_path}")
+            continue
         except Exception as e:
             print(f"Error reading transcript for {episode_title}: {str(e)}")
+            continue
+
+        metadata = {
+            'episode_title': episode_title,
+            'mp3_url': episode_data['mp3_url'],
+            'date': episode_data['date'],
+            'duration': episode_data['duration'],
+            'processed_date': episode_data['processed_date'],
+            'content_hash': content_hash(transcript_text)
+        }
+        transcripts.append((episode_title, transcript_text, metadata))
+    return transcripts
+
+def plan_upload(transcripts: list, existing_rows: list, checkpoint: dict) -> dict:
+    """Split local transcripts into rows to insert, rows to update and unchanged ones.
+
+    When an episode has duplicate rows, the latest one (highest id) is compared and updated,
+    the same row the catalog index and the app read.
+    """
+    existing = {}
+    for row in existing_rows:
+        metadata = row.get('metadata') or {}
+        title = metadata.get('episode_title')
+        if title and (title not in existing or row['id'] > existing[title][0]):
+            existing[title] = (row['id'], metadata.get('content_hash'))
+
+    plan = {'insert': [], 'update': [], 'unchanged': []}
+    for episode_title, text, metadata in transcripts:
+        digest = metadata['content_hash']
+        if checkpoint.get(episode_title) == digest:
+            plan['unchanged'].append(episode_title)
+        elif episode_title not in existing:
+            plan['insert'].append((episode_title, text, metadata))
+        elif existing[episode_title][1] == digest:
+            plan['unchanged'].append(episode_title)
+        else:
+            plan['update'].append((existing[episode_title][0], episode_title, text, metadata))
+    return plan
+
+def upload_existing_transcripts(tracker_path: str = TRACKER_PATH, transcripts_dir: str = TRANSCRIPTS_DIR,
+                                checkpoint_path: str = CHECKPOINT_PATH, batch_size: int = 25,
+                                max_workers: int = 4, dry_run: bool = False):
+    """Idempotently sync local transcripts to Supabase.
+
+    Episodes are identified by title and compared by content hash, so re-runs skip unchanged
+    transcripts and only update changed ones. New transcripts are inserted in batches by a
+    bounded pool of workers, and every finished batch is recorded in a checkpoint file so an
+    interrupted run resumes where it stopped.
+    """
+    supabase = SupabaseClient()
+    checkpoint = load_checkpoint(checkpoint_path)
+    transcripts = load_local_transcripts(tracker_path, transcripts_dir)
+    plan = plan_upload(transcripts, supabase.list_transcripts(), checkpoint)
+
+    print(f"{len(plan['insert'])} to insert, {len(plan['update'])} to update, "
+          f"{len(plan['unchanged'])} unchanged")
+    if dry_run:
+        for episode_title, _, _ in plan['insert']:
+            print(f"Would insert: {episode_title}")
+        for _, episode_title, _, _ in plan['update']:
+            print(f"Would update: {episode_title}")
+        return plan
+
+    checkpoint_lock = threading.Lock()
+
+    def record(done: list):
+        with checkpoint_lock:
+            for episode_title, metadata in done:
+                checkpoint[episode_title] = metadata['content_hash']
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    def insert_batch(batch):
+        supabase.upload_transcripts([(text, metadata) for _, text, metadata in batch])
+        record([(episode_title, metadata) for episode_title, _, metadata in batch])
+        return len(batch)
+
+    def update_row(item):
+        transcript_id, episode_title, text, metadata = item
+        supabase.update_transcript(transcript_id, text, metadata)
+        record([(episode_title, metadata)])
+        return 1
+
+    batches = [plan['insert'][i:i + batch_size] for i in range(0, len(plan['insert']), batch_size)]
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(insert_batch, batch): [title for title, _, _ in batch] for batch in batches}
+        futures.update({executor.submit(update_row, item): [item[1]] for item in plan['update']})
+        for future in as_completed(futures):
+            try:
+                print(f"Uploaded {future.result()} transcript(s)")
+            except Exception as e:
+                failed += len(futures[future])
+                print(f"Failed to upload {', '.join(futures[future])}: {str(e)}")
+
+    print(f"Done: {len(plan['insert']) + len(plan['update']) - failed} uploaded, {failed} failed")
+    return plan
 
 if __name__ == "__main__":
-    upload_existing_transcripts()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Bulk upload local transcripts to Supabase.")
+    parser.add_argument('--tracker', default=TRACKER_PATH)
+    parser.add_argument('--transcripts-dir', default=TRANSCRIPTS_DIR)
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without uploading")
+    args = parser.parse_args()
+
+    upload_existing_transcripts(tracker_path=args.tracker, transcripts_dir=args.transcripts_dir,
+                                checkpoint_path=args.checkpoint, batch_size=args.batch_size,
+                                max_workers=args.workers, dry_run=args.dry_run)